@@ -0,0 +1,101 @@
+/*
+ * CSV column stripper - native hot loop for csv_processor.py
+ * Removes one field from every record, honouring double-quoted fields
+ *
+ * Build:  cc -O2 -shared -fPIC -o _csvstrip.so _csvstrip.c
+ * Loaded through ctypes; csv_processor falls back to Python without it.
+ */
+
+#include <stddef.h>
+#include <string.h>
+
+#define NOT_FOUND ((size_t)-1)
+
+/*
+ * Copy in[0..len) to out without field `col` of each record.
+ * out must hold at least len bytes. Returns the number of bytes written,
+ * or NOT_FOUND when the quoting is irregular and the caller must leave the
+ * file to a real CSV parser: a quote that does not open a field (5" pipe),
+ * text between a closing quote and the next comma or line end ("ab"c), or
+ * input that ends inside a quoted field.
+ *
+ * Follows the pure-Python byte path: short rows are copied unchanged,
+ * a last field is dropped with its leading comma, and the line ending
+ * (LF or CRLF) is always kept. Newlines inside quotes do not end a record.
+ *
+ * As in csv.reader, a quote only opens a quoted field at the start of a
+ * field.
+ */
+size_t gj_strip_column(const unsigned char *in, size_t len, size_t col, unsigned char *out)
+{
+    size_t i = 0, o = 0;
+
+    while (i < len) {
+        size_t start = i, field = 0;
+        size_t fstart = (col == 0) ? i : NOT_FOUND;
+        size_t fend = NOT_FOUND;
+        int at_field_start = 1;
+
+        for (; i < len; i++) {
+            unsigned char c = in[i];
+            if (c == '"' && at_field_start) {
+                /* Skip to the closing quote; "" inside is an escaped quote */
+                for (i++; ; i++) {
+                    if (i >= len)
+                        return NOT_FOUND;
+                    if (in[i] == '"') {
+                        if (i + 1 < len && in[i + 1] == '"')
+                            i++;
+                        else
+                            break;
+                    }
+                }
+                /* The closing quote must end the field */
+                if (i + 1 < len && in[i + 1] != ',' && in[i + 1] != '\n'
+                    && !(in[i + 1] == '\r' && i + 2 < len && in[i + 2] == '\n'))
+                    return NOT_FOUND;
+                at_field_start = 0;
+                continue;
+            }
+            if (c == '"')
+                return NOT_FOUND;
+            at_field_start = 0;
+            if (c == ',') {
+                at_field_start = 1;
+                field++;
+                if (field == col)
+                    fstart = i + 1;
+                else if (field == col + 1)
+                    fend = i;
+            } else if (c == '\n') {
+                break;
+            }
+        }
+
+        size_t end = (i < len) ? i + 1 : len;
+        size_t content_end = (i < len) ? i : len;
+        if (i < len && content_end > start && in[content_end - 1] == '\r')
+            content_end--;
+        i = end;
+
+        if (fstart == NOT_FOUND) {
+            /* Short row: left as is */
+            memcpy(out + o, in + start, end - start);
+            o += end - start;
+        } else if (fend != NOT_FOUND) {
+            memcpy(out + o, in + start, fstart - start);
+            o += fstart - start;
+            memcpy(out + o, in + fend + 1, end - fend - 1);
+            o += end - fend - 1;
+        } else {
+            /* Target is the last field: drop it (and its comma), keep the line ending */
+            if (col > 0) {
+                memcpy(out + o, in + start, fstart - 1 - start);
+                o += fstart - 1 - start;
+            }
+            memcpy(out + o, in + content_end, end - content_end);
+            o += end - content_end;
+        }
+    }
+    return o;
+}
\ No newline at end of file
@@ -9,16 +9,10 @@ import sys
 import time
 import argparse
 import subprocess
-from pathlib import Path
 
-
-def run_command(cmd, capture_output=False):
-    """Run shell command."""
-    if capture_output:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        return result.returncode, result.stdout, result.stderr
-    else:
-        return subprocess.run(cmd, shell=True).returncode, None, None
+from csv_processor import fast_find_csv
+from fast_parallel_processor import run
+from progress_monitor import generate_report
 
 
 def main():
@@ -27,7 +21,7 @@ def main():
     parser.add_argument('directory', help='Directory containing CSV files')
     parser.add_argument('-w', '--workers', type=int, default=None, 
                         help='Number of parallel workers (default: auto)')
-    parser.add_argument('-c', '--checkpoint', type=str, default='checkpoint.json',
+    parser.add_argument('-c', '--checkpoint', type=str, default='checkpoint.log',
                         help='Checkpoint file for resume capability')
     parser.add_argument('-m', '--monitor', action='store_true',
                         help='Run progress monitor in background')
@@ -61,25 +55,23 @@ def main():
     monitor_process = None
     if args.monitor:
         # Count total files first
-        total_files = sum(1 for _ in Path(args.directory).rglob('*.csv'))
+        total_files = len(fast_find_csv(args.directory))
         print(f"Total CSV files: {total_files}")
         
         # Start monitor in background
-        monitor_cmd = f"{sys.executable} progress_monitor.py monitor {args.checkpoint} {total_files}"
-        monitor_process = subprocess.Popen(monitor_cmd, shell=True)
+        monitor_cmd = [sys.executable, 'progress_monitor.py', 'monitor', args.checkpoint, str(total_files)]
+        monitor_process = subprocess.Popen(monitor_cmd)
         print("Progress monitor started in background")
         print()
     
     # Run parallel processor
     start_time = time.time()
     
-    worker_arg = f" {args.workers}" if args.workers else ""
-    cmd = f"{sys.executable} parallel_processor.py {args.directory}{worker_arg} {args.checkpoint}"
-    
     print("Starting parallel processing...")
     print("-" * 50)
     
-    returncode = run_command(cmd)[0]
+    # In-process: no interpreter startup, and the worker pool is shared with this run
+    returncode = run(args.directory, args.workers, args.checkpoint, args.column_index)
     
     print("-" * 50)
     print(f"\nProcessing completed in {time.time() - start_time:.1f} seconds")
@@ -92,8 +84,7 @@ def main():
     # Generate report if requested
     if args.report:
         print(f"\nGenerating report: {args.report}")
-        report_cmd = f"{sys.executable} progress_monitor.py report {args.checkpoint} {args.report}"
-        run_command(report_cmd)
+        generate_report(args.checkpoint, args.report)
     
     return returncode
 
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Log - Append-only record of processed files
+One length-prefixed path per completed file, never rewritten
+"""
+
+import os
+import sys
+import json
+import struct
+
+MAGIC = b'GJCKPT1\n'
+_LENGTH = struct.Struct('<I')
+
+# Records buffered before a flush makes them visible to the monitor
+FLUSH_EVERY = 100
+
+
+def parse_records(data, offset=0):
+    """Decode records from data starting at offset. Returns (paths, offset after last full record)."""
+    paths = []
+    size = len(data)
+    while offset + _LENGTH.size <= size:
+        (length,) = _LENGTH.unpack_from(data, offset)
+        end = offset + _LENGTH.size + length
+        if end > size:
+            break  # Record still being written (or cut short by a crash)
+        paths.append(os.fsdecode(data[offset + _LENGTH.size:end]))
+        offset = end
+    return paths, offset
+
+
+def read_checkpoint(checkpoint_file):
+    """Load the set of processed files. Also reads legacy JSON checkpoints."""
+    if not os.path.exists(checkpoint_file):
+        return set()
+    
+    with open(checkpoint_file, 'rb') as f:
+        data = f.read()
+    
+    if not data.startswith(MAGIC):
+        if not data.strip():
+            return set()
+        return set(json.loads(data).get('processed', []))
+    
+    paths, _ = parse_records(data, len(MAGIC))
+    return set(paths)
+
+
+class CheckpointLog:
+    """Append-only checkpoint: record() is O(1) no matter how many files are done."""
+    
+    def __init__(self, checkpoint_file, flush_every=FLUSH_EVERY):
+        self.path = checkpoint_file
+        self.flush_every = flush_every
+        self.processed = read_checkpoint(checkpoint_file)
+        self._pending = 0
+        
+        if os.path.exists(checkpoint_file) and not self._is_log():
+            # Legacy JSON checkpoint: convert it once, then append from there
+            self._file = open(checkpoint_file, 'wb')
+            self._file.write(MAGIC)
+            for path in self.processed:
+                self._write(path)
+            self._file.flush()
+        else:
+            self._file = open(checkpoint_file, 'ab')
+            if self._file.tell() == 0:
+                self._file.write(MAGIC)
+                self._file.flush()
+    
+    def _is_log(self):
+        """True if the file on disk is empty or already in log format."""
+        with open(self.path, 'rb') as f:
+            head = f.read(len(MAGIC))
+        return head in (b'', MAGIC)
+    
+    def _write(self, path):
+        encoded = os.fsencode(path)
+        self._file.write(_LENGTH.pack(len(encoded)) + encoded)
+    
+    def record(self, path):
+        """Mark one file as processed."""
+        if path in self.processed:
+            return
+        self.processed.add(path)
+        self._write(path)
+        
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        """Push buffered records to the file."""
+        self._file.flush()
+        self._pending = 0
+    
+    def close(self):
+        """Flush and close the log."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CheckpointReader:
+    """Follow a checkpoint that another process is writing.
+    
+    poll() only stats the file while it is unchanged, and only parses the
+    records appended since the previous poll.
+    """
+    
+    def __init__(self, checkpoint_file):
+        self.path = checkpoint_file
+        self.processed = set()
+        self._offset = 0
+        self._stat = None
+    
+    def poll(self):
+        """Pick up new records. Returns the number of processed files."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return len(self.processed)
+        
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._stat:
+            return len(self.processed)
+        self._stat = key
+        
+        if st.st_size < self._offset:
+            # Rewritten from scratch (e.g. a new run): start over
+            self.processed = set()
+            self._offset = 0
+        
+        with open(self.path, 'rb') as f:
+            if self._offset == 0:
+                head = f.read(len(MAGIC))
+                if head != MAGIC:
+                    if len(head) == len(MAGIC) or not MAGIC.startswith(head):
+                        # Legacy JSON checkpoint: no way around a full parse
+                        self.processed = read_checkpoint(self.path)
+                    return len(self.processed)
+                self._offset = len(MAGIC)
+            
+            f.seek(self._offset)
+            data = f.read()
+        
+        paths, used = parse_records(data)
+        self._offset += used
+        self.processed.update(paths)
+        return len(self.processed)
+
+
+def main():
+    """Print the processed files recorded in a checkpoint."""
+    if len(sys.argv) < 2:
+        print("Usage: checkpoint.py <checkpoint_file>", file=sys.stderr)
+        sys.exit(1)
+    
+    for path in sorted(read_checkpoint(sys.argv[1])):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -4,41 +4,20 @@ Fast Parallel CSV Processor - Optimized version
 Direct multiprocessing without subprocess overhead
 """
 
-import os
 import sys
-import csv
 import time
 import json
-import tempfile
-import shutil
 import multiprocessing as mp
-from pathlib import Path
 from functools import partial
 from tqdm import tqdm
 
+from csv_processor import remove_column, prefer_serial, run_workers, suggest_serial, fast_find_csv
+from checkpoint import CheckpointLog
+
 
 def remove_column_direct(csv_file, column_index=0):
     """Remove column from CSV file - optimized version."""
-    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(csv_file))
-    
-    try:
-        with os.fdopen(temp_fd, 'w', newline='', encoding='utf-8') as temp_file:
-            with open(csv_file, 'r', newline='', encoding='utf-8-sig') as infile:
-                reader = csv.reader(infile)
-                writer = csv.writer(temp_file)
-                
-                for row in reader:
-                    if len(row) > column_index:
-                        row.pop(column_index)
-                    writer.writerow(row)
-        
-        shutil.move(temp_path, csv_file)
-        return True, None
-        
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        return False, str(e)
+    return remove_column(csv_file, column_index)
 
 
 def process_file_worker(csv_file, column_index=0):
@@ -54,76 +33,73 @@ def process_file_worker(csv_file, column_index=0):
     }
 
 
-def process_batch(files_batch, column_index=0):
-    """Process a batch of files - for better load balancing."""
-    results = []
-    for csv_file in files_batch:
-        results.append(process_file_worker(csv_file, column_index))
-    return results
-
-
-def create_batches(files, num_batches):
-    """Create balanced batches of files."""
-    batch_size = len(files) // num_batches + 1
-    return [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
-
-
-def main():
-    """Main function with optimized parallel processing."""
-    if len(sys.argv) < 2:
-        print("Usage: fast_parallel_processor.py <directory> [num_workers]")
-        sys.exit(1)
-    
-    directory = sys.argv[1]
-    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else mp.cpu_count()
+def run(directory, num_workers=None, checkpoint_file=None, column_index=0):
+    """Remove a column from every CSV under directory. Returns an exit code."""
+    if num_workers is None:
+        num_workers = mp.cpu_count()
     
     # Find all CSV files
-    csv_files = list(Path(directory).rglob('*.csv'))
-    total_files = len(csv_files)
+    file_paths = fast_find_csv(directory)
+    
+    # Skip files a previous run already finished
+    log = None
+    if checkpoint_file:
+        log = CheckpointLog(checkpoint_file)
+        file_paths = [f for f in file_paths if f not in log.processed]
+        print(f"Resuming from checkpoint: {len(log.processed)} already processed")
+    total_files = len(file_paths)
     
     if total_files == 0:
         print(f"No CSV files found in {directory}")
-        return
+        if log:
+            log.close()
+        return 0
+    
+    if prefer_serial(file_paths, num_workers):
+        num_workers = 1
     
     print(f"Processing {total_files} CSV files with {num_workers} workers")
     
-    # Create batches for better load balancing
-    file_paths = [str(f) for f in csv_files]
-    batches = create_batches(file_paths, num_workers * 4)  # More batches than workers
+    # The default column needs no partial: the plain function pickles by reference
+    if column_index == 0:
+        worker = process_file_worker
+    else:
+        worker = partial(process_file_worker, column_index=column_index)
     
     # Process in parallel
     start_time = time.time()
     failed = 0
     
-    # Use process pool
-    with mp.Pool(num_workers) as pool:
-        # Map batches to workers
-        batch_results = pool.map(partial(process_batch, column_index=0), batches)
+    # Use tqdm to display progress
+    with tqdm(total=total_files, desc="🚀 Processing CSV files", 
+              unit="files", ncols=100,
+              mininterval=0.25, miniters=max(1, total_files // 500), smoothing=0.05,
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
         
-        # Use tqdm to display progress
-        with tqdm(total=total_files, desc="🚀 Processing CSV files", 
-                  unit="files", ncols=100,
-                  bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+        for result in run_workers(worker, file_paths, num_workers):
+            if result['success']:
+                if log:
+                    log.record(result['file'])
+            else:
+                failed += 1
+                # Use tqdm.write to avoid interfering with progress bar
+                tqdm.write(f"❌ Failed: {result['file']}: {result['error']}")
             
-            # Flatten results and report progress
-            for batch_result in batch_results:
-                for result in batch_result:
-                    if not result['success']:
-                        failed += 1
-                        # Use tqdm.write to avoid interfering with progress bar
-                        tqdm.write(f"❌ Failed: {result['file']}: {result['error']}")
-                    
-                    # Update progress bar
-                    pbar.update(1)
-                    
-                    # Update real-time statistics
-                    elapsed = time.time() - start_time
-                    rate = pbar.n / elapsed if elapsed > 0 else 0
-                    pbar.set_postfix({
-                        'Success': pbar.n - failed,
-                        'Failed': failed,
-                        'Rate': f'{rate:.1f}/s'
-                    })
+            # Update progress bar
+            pbar.update(1)
+            
+            # Update real-time statistics every 64 files; postfix formatting is costly
+            if pbar.n & 0x3F == 0 or pbar.n == pbar.total:
+                elapsed = time.time() - start_time
+                rate = pbar.n / elapsed if elapsed > 0 else 0
+                pbar.set_postfix({
+                    'Success': pbar.n - failed,
+                    'Failed': failed,
+                    'Rate': f'{rate:.1f}/s'
+                })
+    
+    if log:
+        log.close()
     
     # Final summary
     elapsed = time.time() - start_time
@@ -133,7 +109,24 @@ def main():
     print(f"✅ Success: {total_files - failed}")
     print(f"❌ Failed: {failed}")
     print(f"🚀 Average rate: {total_files/elapsed:.0f} files/sec")
+    if suggest_serial(num_workers, elapsed):
+        print("💡 Tip: jobs this small usually run faster serially (num_workers=1)")
+    
+    return 1 if failed else 0
+
+
+def main():
+    """Main function with optimized parallel processing."""
+    if len(sys.argv) < 2:
+        print("Usage: fast_parallel_processor.py <directory> [num_workers] [checkpoint_file]")
+        sys.exit(1)
+    
+    directory = sys.argv[1]
+    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    checkpoint_file = sys.argv[3] if len(sys.argv) > 3 else None
+    
+    return run(directory, num_workers, checkpoint_file)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
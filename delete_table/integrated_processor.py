@@ -7,20 +7,27 @@ Combines fast parallel CSV column removal with character replacement and file re
 """
 
 import os
-import csv
-import shutil
 import threading
 import argparse
 import time
-import tempfile
 import multiprocessing as mp
 from pathlib import Path
 from functools import partial
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 from dataclasses import dataclass
 from tqdm import tqdm
 
+from csv_processor import (remove_column, replace_bytes_in_file, prefer_serial, run_workers, suggest_serial,
+                           fast_find_files, fast_find_csv, fast_copy)
+
+DEFAULT_OLD_CHAR = 'ԥ'
+DEFAULT_NEW_CHAR = '豫'
+
+# Encoded once; phase 2 compares bytes without decoding the file
+_OLD_BYTES = DEFAULT_OLD_CHAR.encode('utf-8')
+_NEW_BYTES = DEFAULT_NEW_CHAR.encode('utf-8')
+
 
 @dataclass
 class ProcessingStats:
@@ -36,69 +43,36 @@ class ProcessingStats:
 
 def remove_column_from_csv(csv_file: str, column_index: int = 0) -> tuple[bool, Optional[str]]:
     """Remove specified column from CSV file"""
-    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(csv_file))
-    
-    try:
-        with os.fdopen(temp_fd, 'w', newline='', encoding='utf-8') as temp_file:
-            with open(csv_file, 'r', newline='', encoding='utf-8-sig') as infile:
-                reader = csv.reader(infile)
-                writer = csv.writer(temp_file)
-                
-                for row in reader:
-                    if len(row) > column_index:
-                        row.pop(column_index)
-                    writer.writerow(row)
-        
-        shutil.move(temp_path, csv_file)
-        return True, None
-        
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        return False, str(e)
+    return remove_column(csv_file, column_index)
 
 
-def process_csv_batch(files_batch: List[str], column_index: int = 0) -> List[Dict]:
-    """Process a batch of CSV files for column removal"""
-    results = []
-    for csv_file in files_batch:
-        start_time = time.time()
-        success, error = remove_column_from_csv(csv_file, column_index)
-        
-        results.append({
-            'file': csv_file,
-            'success': success,
-            'time': time.time() - start_time,
-            'error': error
-        })
-    return results
+def process_csv_file(csv_file: str, column_index: int = 0) -> Dict:
+    """Process a single CSV file for column removal"""
+    start_time = time.time()
+    success, error = remove_column_from_csv(csv_file, column_index)
+    
+    return {
+        'file': csv_file,
+        'success': success,
+        'time': time.time() - start_time,
+        'error': error
+    }
 
 
-def create_batches(files: List[str], num_batches: int) -> List[List[str]]:
-    """Create balanced batches of files"""
-    batch_size = len(files) // num_batches + 1
-    return [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+def _replacement_bytes(old_char: str, new_char: str) -> tuple[bytes, bytes]:
+    """UTF-8 encodings of the replacement pair, cached for the default characters"""
+    if old_char == DEFAULT_OLD_CHAR and new_char == DEFAULT_NEW_CHAR:
+        return _OLD_BYTES, _NEW_BYTES
+    return old_char.encode('utf-8'), new_char.encode('utf-8')
 
 
-def replace_character_in_csv_content(file_path: Path, old_char: str = 'ԥ', new_char: str = '豫') -> bool:
-    """Replace character in CSV file content"""
-    temp_file = str(file_path) + '.tmp'
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as infile, \
-             open(temp_file, 'w', encoding='utf-8', newline='') as outfile:
-            
-            content = infile.read()
-            updated_content = content.replace(old_char, new_char)
-            outfile.write(updated_content)
-        
-        shutil.move(temp_file, file_path)
-        return True
-        
-    except Exception as e:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        return False
+def replace_character_in_csv_content(file_path: Path, old_char: str = 'ԥ', new_char: str = '豫',
+                                     replacement: Optional[tuple[bytes, bytes]] = None) -> bool:
+    """Replace character in CSV file content; files without the character are not rewritten"""
+    old_bytes, new_bytes = replacement or _replacement_bytes(old_char, new_char)
+    # UTF-8 is self-synchronizing, so a byte search can't match mid-character
+    success, _ = replace_bytes_in_file(str(file_path), old_bytes, new_bytes)
+    return success
 
 
 def rename_file_with_character_replacement(file_path: Path, old_char: str = 'ԥ', new_char: str = '豫') -> tuple[str, bool]:
@@ -118,8 +92,12 @@ def rename_file_with_character_replacement(file_path: Path, old_char: str = 'ԥ'
         return str(file_path), False
 
 
-def process_single_file_character_replacement(file_path: Path, old_char: str = 'ԥ', new_char: str = '豫', verbose: bool = False) -> Dict:
-    """Process a single file for character replacement and renaming"""
+def process_single_file_character_replacement(file_path: Path, old_char: str = 'ԥ', new_char: str = '豫', verbose: bool = False,
+                                              replacement: Optional[tuple[bytes, bytes]] = None) -> Dict:
+    """Process a single file for character replacement and renaming
+    
+    replacement is the pre-encoded (old, new) byte pair, computed once per run by the caller.
+    """
     result = {
         'file_path': str(file_path),
         'success': False,
@@ -132,7 +110,7 @@ def process_single_file_character_replacement(file_path: Path, old_char: str = '
     try:
         # Step 1: Replace content if it's a CSV file
         if file_path.suffix.lower() == '.csv':
-            if not replace_character_in_csv_content(file_path, old_char, new_char):
+            if not replace_character_in_csv_content(file_path, old_char, new_char, replacement):
                 result['error_msg'] = "Failed to replace CSV content"
                 return result
         
@@ -157,8 +135,8 @@ def phase1_column_removal(directory: Path, column_index: int = 0, num_workers: i
     print(f"🔧 === Phase 1: Column Removal ===")
     
     # Find all CSV files
-    csv_files = list(directory.rglob('*.csv'))
-    total_files = len(csv_files)
+    file_paths = fast_find_csv(directory)
+    total_files = len(file_paths)
     
     if total_files == 0:
         print(f"No CSV files found in {directory}")
@@ -167,40 +145,42 @@ def phase1_column_removal(directory: Path, column_index: int = 0, num_workers: i
     if num_workers is None:
         num_workers = mp.cpu_count()
     
-    print(f"Processing {total_files} CSV files with {num_workers} workers")
+    if prefer_serial(file_paths, num_workers):
+        num_workers = 1
     
-    # Create batches for better load balancing
-    file_paths = [str(f) for f in csv_files]
-    batches = create_batches(file_paths, num_workers * 4)
+    print(f"Processing {total_files} CSV files with {num_workers} workers")
     
     # Process in parallel
     start_time = time.time()
     failed = 0
     
-    with mp.Pool(num_workers) as pool:
-        batch_results = pool.map(partial(process_csv_batch, column_index=column_index), batches)
+    with tqdm(total=total_files, desc="🗑️  Removing columns", 
+              unit="files", ncols=100,
+              mininterval=0.25, miniters=max(1, total_files // 500), smoothing=0.05,
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
         
-        with tqdm(total=total_files, desc="🗑️  Removing columns", 
-                  unit="files", ncols=100,
-                  bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+        # The default column needs no partial: the plain function pickles by reference
+        worker = process_csv_file if column_index == 0 else partial(process_csv_file, column_index=column_index)
+        for result in run_workers(worker, file_paths, num_workers):
+            if not result['success']:
+                failed += 1
+                if verbose:
+                    tqdm.write(f"❌ Failed: {result['file']}: {result['error']}")
             
-            for batch_result in batch_results:
-                for result in batch_result:
-                    if not result['success']:
-                        failed += 1
-                        if verbose:
-                            tqdm.write(f"❌ Failed: {result['file']}: {result['error']}")
-                    
-                    pbar.update(1)
-                    pbar.set_postfix({
-                        'Success': pbar.n - failed,
-                        'Failed': failed
-                    })
+            pbar.update(1)
+            # Postfix formatting is costly; refresh it every 64 files
+            if pbar.n & 0x3F == 0 or pbar.n == pbar.total:
+                pbar.set_postfix({
+                    'Success': pbar.n - failed,
+                    'Failed': failed
+                })
     
     elapsed = time.time() - start_time
     success = total_files - failed
     
     print(f"✅ Phase 1 completed in {elapsed:.1f}s - Success: {success}, Failed: {failed}")
+    if suggest_serial(num_workers, elapsed):
+        print("💡 Tip: jobs this small usually run faster serially (--mp-workers 1)")
     
     return {'success': success, 'failed': failed, 'total': total_files, 'time': elapsed}
 
@@ -211,15 +191,18 @@ def phase2_character_replacement(directory: Path, old_char: str = 'ԥ', new_char
     print(f"🔤 === Phase 2: Character Replacement ===")
     
     # Find all files that need processing
-    all_files = list(directory.rglob("*"))
-    files_to_process = [f for f in all_files if f.is_file() and (old_char in f.name or f.suffix.lower() == '.csv')]
+    all_files = [Path(p) for p in fast_find_files(directory)]
+    files_to_process = [f for f in all_files if old_char in f.name or f.suffix.lower() == '.csv']
     
     if not files_to_process:
         print("No files found that need character replacement")
         return {'success': 0, 'failed': 0, 'renamed': 0, 'total': 0}
     
     if max_workers is None:
-        max_workers = min(32, (os.cpu_count() or 1) + 4)
+        max_workers = mp.cpu_count()
+    
+    if prefer_serial([str(f) for f in files_to_process], max_workers):
+        max_workers = 1
     
     print(f"Processing {len(files_to_process)} files with {max_workers} workers")
     
@@ -227,29 +210,26 @@ def phase2_character_replacement(directory: Path, old_char: str = 'ԥ', new_char
     error_count = 0
     renamed_count = 0
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_file = {
-            executor.submit(process_single_file_character_replacement, file_path, old_char, new_char, verbose): file_path 
-            for file_path in files_to_process
-        }
+    # Worker processes, like phase 1: the replace itself is CPU work that threads would serialize on
+    with tqdm(total=len(files_to_process), desc="🔤 Replacing characters", 
+              unit="files", ncols=100,
+              mininterval=0.25, miniters=max(1, len(files_to_process) // 500), smoothing=0.05,
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
         
-        with tqdm(total=len(files_to_process), desc="🔤 Replacing characters", 
-                  unit="files", ncols=100,
-                  bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+        worker = partial(process_single_file_character_replacement, old_char=old_char, new_char=new_char, verbose=verbose,
+                         replacement=_replacement_bytes(old_char, new_char))
+        for result in run_workers(worker, files_to_process, max_workers):
+            if result['success']:
+                success_count += 1
+                if result['renamed']:
+                    renamed_count += 1
+            else:
+                error_count += 1
+                if verbose:
+                    tqdm.write(f"❌ ERROR processing {result['file_path']}: {result['error_msg']}")
             
-            for future in as_completed(future_to_file):
-                result = future.result()
-                
-                if result['success']:
-                    success_count += 1
-                    if result['renamed']:
-                        renamed_count += 1
-                else:
-                    error_count += 1
-                    if verbose:
-                        tqdm.write(f"❌ ERROR processing {result['file_path']}: {result['error_msg']}")
-                
-                pbar.update(1)
+            pbar.update(1)
+            if pbar.n & 0x3F == 0 or pbar.n == pbar.total:
                 pbar.set_postfix({
                     'Success': success_count,
                     'Errors': error_count,
@@ -266,6 +246,96 @@ def phase2_character_replacement(directory: Path, old_char: str = 'ԥ', new_char
     }
 
 
+def process_csv_fused(csv_file: str, column_index: int = 0, old_char: str = 'ԥ', new_char: str = '豫') -> Dict:
+    """Remove a column, replace characters and rename a CSV file in a single read/write pass"""
+    start_time = time.time()
+    success, error = remove_column(csv_file, column_index, replace=(old_char, new_char))
+    
+    renamed = False
+    if success and old_char in os.path.basename(csv_file):
+        _, renamed = rename_file_with_character_replacement(Path(csv_file), old_char, new_char)
+    
+    return {
+        'file': csv_file,
+        'success': success,
+        'renamed': renamed,
+        'time': time.time() - start_time,
+        'error': error
+    }
+
+
+def fused_column_removal_and_replacement(directory: Path, column_index: int = 0, old_char: str = 'ԥ', new_char: str = '豫',
+                                         num_workers: int = None, verbose: bool = False) -> Dict:
+    """Phase 1 + 2 fused: each CSV is read and written once instead of twice"""
+    print(f"🔧 === Phase 1+2: Column Removal + Character Replacement ===")
+    
+    # One walk serves both lists
+    all_paths = fast_find_files(directory)
+    file_paths = [p for p in all_paths if p.lower().endswith('.csv')]
+    # Non-CSV files only need renaming
+    other_files = [f for f in map(Path, all_paths) if old_char in f.name and f.suffix.lower() != '.csv']
+    total_files = len(file_paths)
+    
+    if num_workers is None:
+        num_workers = mp.cpu_count()
+    
+    if file_paths and prefer_serial(file_paths, num_workers):
+        num_workers = 1
+    
+    print(f"Processing {total_files} CSV files with {num_workers} workers")
+    
+    start_time = time.time()
+    failed = 0
+    renamed = 0
+    
+    with tqdm(total=total_files, desc="🔧 Processing CSV files", 
+              unit="files", ncols=100,
+              mininterval=0.25, miniters=max(1, total_files // 500), smoothing=0.05,
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+        
+        worker = partial(process_csv_fused, column_index=column_index, old_char=old_char, new_char=new_char)
+        for result in run_workers(worker, file_paths, num_workers):
+            if not result['success']:
+                failed += 1
+                if verbose:
+                    tqdm.write(f"❌ Failed: {result['file']}: {result['error']}")
+            elif result['renamed']:
+                renamed += 1
+            
+            pbar.update(1)
+            if pbar.n & 0x3F == 0 or pbar.n == pbar.total:
+                pbar.set_postfix({
+                    'Success': pbar.n - failed,
+                    'Failed': failed,
+                    'Renamed': renamed
+                })
+    
+    other_failed = 0
+    for file_path in other_files:
+        _, was_renamed = rename_file_with_character_replacement(file_path, old_char, new_char)
+        if was_renamed:
+            renamed += 1
+        else:
+            other_failed += 1
+    
+    elapsed = time.time() - start_time
+    success = total_files - failed
+    
+    print(f"✅ Phase 1+2 completed in {elapsed:.1f}s - Success: {success}, Failed: {failed}, Renamed: {renamed}")
+    if suggest_serial(num_workers, elapsed):
+        print("💡 Tip: jobs this small usually run faster serially (--mp-workers 1)")
+    
+    return {
+        'success': success,
+        'failed': failed,
+        'total': total_files,
+        'other_success': len(other_files) - other_failed,
+        'other_failed': other_failed,
+        'renamed': renamed,
+        'time': elapsed
+    }
+
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
@@ -274,7 +344,8 @@ def parse_arguments():
         epilog="""
 Processing Pipeline:
   1. Phase 1: Remove specified column from all CSV files (multiprocessing)
-  2. Phase 2: Replace characters in file content and rename files (threading)
+  2. Phase 2: Replace characters in file content and rename files (multiprocessing)
+  When neither phase is skipped, both run in a single read/write pass per CSV
 
 Directory Structure:
   Input:  /path/to/input_folder
@@ -300,7 +371,7 @@ Usage Examples:
     parser.add_argument('--mp-workers', type=int, default=None,
                        help='Number of multiprocessing workers for column removal (default: auto)')
     parser.add_argument('--thread-workers', type=int, default=None,
-                       help='Number of thread workers for character replacement (default: auto)')
+                       help='Number of worker processes for character replacement (default: auto)')
     parser.add_argument('--skip-column-removal', action='store_true',
                        help='Skip phase 1 (column removal)')
     parser.add_argument('--skip-character-replacement', action='store_true',
@@ -341,19 +412,28 @@ def copy_files_to_processed_dir(input_dir: Path, processed_dir: Path, verbose: b
     copied_count = 0
     print(f"📋 Copying {len(files_to_copy)} files to processed directory...")
     
-    with tqdm(files_to_copy, desc="📋 Copying files", unit="files", ncols=100) as pbar:
-        for file_path in pbar:
-            try:
-                dest_file = processed_dir / file_path.name
-                shutil.copy2(file_path, dest_file)
-                copied_count += 1
-                if verbose:
-                    tqdm.write(f"Copied: {file_path.name}")
-            except Exception as e:
-                if verbose:
-                    tqdm.write(f"❌ Failed to copy {file_path.name}: {e}")
-            
-            pbar.set_postfix({'Copied': copied_count})
+    # Copies are I/O-bound; threads keep several requests in flight at once
+    max_workers = min(16, (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_file = {
+            executor.submit(fast_copy, file_path, processed_dir / file_path.name): file_path
+            for file_path in files_to_copy
+        }
+        
+        with tqdm(total=len(files_to_copy), desc="📋 Copying files", unit="files", ncols=100) as pbar:
+            for future in as_completed(future_to_file):
+                file_path = future_to_file[future]
+                try:
+                    future.result()
+                    copied_count += 1
+                    if verbose:
+                        tqdm.write(f"Copied: {file_path.name}")
+                except Exception as e:
+                    if verbose:
+                        tqdm.write(f"❌ Failed to copy {file_path.name}: {e}")
+                
+                pbar.update(1)
+                pbar.set_postfix({'Copied': copied_count})
     
     print(f"✅ Copied {copied_count} files")
     return copied_count
@@ -405,19 +485,30 @@ def main():
     
     if dry_run:
         print("🧪 === DRY RUN SUMMARY ===")
-        csv_files = list(input_dir.rglob('*.csv'))
+        csv_files = fast_find_csv(input_dir)
         print(f"Would process {len(csv_files)} CSV files for column removal")
         
-        all_files = list(input_dir.rglob("*"))
-        files_needing_char_replacement = [f for f in all_files if f.is_file() and (old_char in f.name or f.suffix.lower() == '.csv')]
+        all_files = [Path(p) for p in fast_find_files(input_dir)]
+        files_needing_char_replacement = [f for f in all_files if old_char in f.name or f.suffix.lower() == '.csv']
         print(f"Would process {len(files_needing_char_replacement)} files for character replacement")
         return 0
     
     # Copy files to processed directory if needed
     copied_files = copy_files_to_processed_dir(input_dir, processed_dir, verbose)
     
+    if not skip_column_removal and not skip_character_replacement:
+        # Both phases touch every CSV, so do them in one pass
+        fused_results = fused_column_removal_and_replacement(processed_dir, column_index, old_char, new_char,
+                                                             mp_workers, verbose)
+        stats.total_files = fused_results['total']
+        stats.column_removal_success = fused_results['success']
+        stats.column_removal_failed = fused_results['failed']
+        stats.character_replacement_success = fused_results['success'] + fused_results['other_success']
+        stats.character_replacement_failed = fused_results['failed'] + fused_results['other_failed']
+        stats.files_renamed = fused_results['renamed']
+    
     # Phase 1: Column Removal
-    if not skip_column_removal:
+    elif not skip_column_removal:
         phase1_results = phase1_column_removal(processed_dir, column_index, mp_workers, verbose)
         stats.total_files = phase1_results['total']
         stats.column_removal_success = phase1_results['success']
@@ -428,12 +519,12 @@ def main():
     print()
     
     # Phase 2: Character Replacement
-    if not skip_character_replacement:
+    if skip_column_removal and not skip_character_replacement:
         phase2_results = phase2_character_replacement(processed_dir, old_char, new_char, thread_workers, verbose)
         stats.character_replacement_success = phase2_results['success']
         stats.character_replacement_failed = phase2_results['failed']
         stats.files_renamed = phase2_results['renamed']
-    else:
+    elif skip_character_replacement:
         print("⏩ Skipping Phase 2 (character replacement)")
     
     # Final summary
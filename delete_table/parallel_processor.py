@@ -1,36 +1,32 @@
 #!/usr/bin/env python3
 """
 Parallel CSV Processor - Multiprocessing Task Distributor
-Handles parallel execution of csv_processor.py
+Runs csv_processor's column removal in a pool of worker processes
 """
 
 import os
 import sys
-import glob
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
 import time
-import json
+
+from csv_processor import remove_column, fast_find_csv, _pool_context
+from checkpoint import CheckpointLog
 
 
 def process_single_file(csv_file):
-    """Process a single CSV file using csv_processor.py."""
+    """Process a single CSV file with csv_processor's remove_column."""
     try:
         start_time = time.time()
         
-        # Call csv_processor.py as subprocess
-        result = subprocess.run(
-            [sys.executable, 'csv_processor.py', csv_file, '0'],
-            capture_output=True,
-            text=True
-        )
+        # In-process call: no interpreter startup or re-import per file
+        success, error = remove_column(csv_file, 0)
         
         return {
             'file': csv_file,
-            'success': result.returncode == 0,
+            'success': success,
             'time': time.time() - start_time,
-            'error': result.stderr if result.returncode != 0 else None
+            'error': error
         }
     except Exception as e:
         return {
@@ -42,23 +38,8 @@ def process_single_file(csv_file):
 
 
 def find_csv_files(directory):
-    """Find all CSV files in directory."""
-    pattern = os.path.join(directory, '**', '*.csv')
-    return glob.glob(pattern, recursive=True)
-
-
-def load_checkpoint(checkpoint_file):
-    """Load processed files from checkpoint."""
-    if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, 'r') as f:
-            return set(json.load(f).get('processed', []))
-    return set()
-
-
-def save_checkpoint(checkpoint_file, processed_files):
-    """Save checkpoint with processed files."""
-    with open(checkpoint_file, 'w') as f:
-        json.dump({'processed': list(processed_files)}, f)
+    """Find all CSV files in directory (os.scandir walk, no fnmatch or extra stat per entry)."""
+    return fast_find_csv(directory)
 
 
 def process_files_parallel(directory, num_workers=None, checkpoint_file=None):
@@ -79,58 +60,57 @@ def process_files_parallel(directory, num_workers=None, checkpoint_file=None):
     print(f"Found {total_files} CSV files")
     print(f"Using {num_workers} workers")
     
-    # Load checkpoint
-    processed = set()
+    # Load checkpoint: an append-only log, so each success costs one small write
+    log = None
     if checkpoint_file:
-        processed = load_checkpoint(checkpoint_file)
-        csv_files = [f for f in csv_files if f not in processed]
-        print(f"Resuming from checkpoint: {len(processed)} already processed")
+        log = CheckpointLog(checkpoint_file)
+        csv_files = [f for f in csv_files if f not in log.processed]
+        print(f"Resuming from checkpoint: {len(log.processed)} already processed")
     
     # Process files in parallel
     completed = 0
     failed = 0
     start_time = time.time()
     
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        # Submit all tasks
-        future_to_file = {executor.submit(process_single_file, f): f for f in csv_files}
-        
-        # Process results as they complete
-        for future in as_completed(future_to_file):
-            result = future.result()
-            completed += 1
-            
-            if result['success']:
-                processed.add(result['file'])
-            else:
-                failed += 1
-                print(f"\nFailed: {result['file']}: {result['error']}", file=sys.stderr)
+    try:
+        # On Linux, forked workers inherit the already-imported modules (spawn elsewhere)
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=_pool_context()) as executor:
+            # Hand files to workers in batches: one pickle and queue round trip per
+            # batch instead of a Future per file (same sizing as csv_processor.run_workers)
+            chunksize = max(1, len(csv_files) // (num_workers * 4))
             
-            # Progress report
-            if completed % 100 == 0 or completed == len(csv_files):
-                elapsed = time.time() - start_time
-                rate = completed / elapsed if elapsed > 0 else 0
-                remaining = (len(csv_files) - completed) / rate if rate > 0 else 0
+            # Results come back in submission order as each batch finishes
+            for result in executor.map(process_single_file, csv_files, chunksize=chunksize):
+                completed += 1
                 
-                print(f"\rProgress: {completed}/{len(csv_files)} "
-                      f"({completed/len(csv_files)*100:.1f}%) "
-                      f"Rate: {rate:.0f} files/sec "
-                      f"ETA: {int(remaining//60)}:{int(remaining%60):02d} "
-                      f"Failed: {failed}", end='', flush=True)
+                if result['success']:
+                    if log:
+                        log.record(result['file'])
+                else:
+                    failed += 1
+                    print(f"\nFailed: {result['file']}: {result['error']}", file=sys.stderr)
                 
-                # Save checkpoint periodically
-                if checkpoint_file and completed % 1000 == 0:
-                    save_checkpoint(checkpoint_file, processed)
+                # Progress report
+                if completed % 100 == 0 or completed == len(csv_files):
+                    elapsed = time.time() - start_time
+                    rate = completed / elapsed if elapsed > 0 else 0
+                    remaining = (len(csv_files) - completed) / rate if rate > 0 else 0
+                    
+                    print(f"\rProgress: {completed}/{len(csv_files)} "
+                          f"({completed/len(csv_files)*100:.1f}%) "
+                          f"Rate: {rate:.0f} files/sec "
+                          f"ETA: {int(remaining//60)}:{int(remaining%60):02d} "
+                          f"Failed: {failed}", end='', flush=True)
+    finally:
+        # Flush whatever is buffered, even when interrupted
+        if log:
+            log.close()
     
     # Final report
     print(f"\n\nCompleted processing {total_files} files")
     print(f"Success: {total_files - failed}")
     print(f"Failed: {failed}")
     print(f"Total time: {time.time() - start_time:.1f} seconds")
-    
-    # Save final checkpoint
-    if checkpoint_file:
-        save_checkpoint(checkpoint_file, processed)
 
 
 def main():
@@ -10,15 +10,23 @@ import json
 import os
 from datetime import datetime
 
+from checkpoint import MAGIC, CheckpointReader, read_checkpoint
+
 
 class ProgressBar:
     """Simple progress bar implementation."""
     
+    # Redraws per second at most; the final state is always drawn
+    MAX_FPS = 20
+    
     def __init__(self, total, width=40):
         self.total = total
         self.width = width
         self.current = 0
         self.start_time = time.time()
+        self._last_draw = 0.0
+        self._last_text = None
+        self._bar_cache = {}
         
     def update(self, count):
         """Update progress bar."""
@@ -27,19 +35,49 @@ class ProgressBar:
         
     def _draw(self):
         """Draw progress bar to stdout."""
+        now = time.monotonic()
+        if now - self._last_draw < 1 / self.MAX_FPS and self.current < self.total:
+            return
+        
         percent = self.current / self.total if self.total > 0 else 0
         filled = int(self.width * percent)
-        bar = '█' * filled + '░' * (self.width - filled)
+        bar = self._bar_cache.get(filled)
+        if bar is None:
+            bar = self._bar_cache[filled] = '█' * filled + '░' * (self.width - filled)
         
         elapsed = time.time() - self.start_time
         rate = self.current / elapsed if elapsed > 0 else 0
         eta = (self.total - self.current) / rate if rate > 0 else 0
         
-        print(f'\r[{bar}] {percent*100:.1f}% | '
-              f'{self.current}/{self.total} | '
-              f'{rate:.0f} files/s | '
-              f'ETA: {int(eta//60)}:{int(eta%60):02d}', 
-              end='', flush=True)
+        text = (f'\r[{bar}] {percent*100:.1f}% | '
+                f'{self.current}/{self.total} | '
+                f'{rate:.0f} files/s | '
+                f'ETA: {int(eta//60)}:{int(eta%60):02d}')
+        if text == self._last_text:
+            return
+        
+        self._last_draw = now
+        self._last_text = text
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+def count_csv(root):
+    """Count *.csv files under root with an iterative scandir walk."""
+    count = 0
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue  # Vanished or unreadable directory
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.csv') and entry.is_file(follow_symlinks=False):
+                    count += 1
+    return count
 
 
 def monitor_checkpoint(checkpoint_file, total_files=None):
@@ -53,27 +91,26 @@ def monitor_checkpoint(checkpoint_file, total_files=None):
     if total_files is None:
         print("Counting total files...")
         directory = os.path.dirname(checkpoint_file) or '.'
-        total_files = sum(1 for _ in glob.glob(os.path.join(directory, '**', '*.csv'), recursive=True))
+        total_files = count_csv(directory)
     
     progress = ProgressBar(total_files)
     last_count = 0
+    reader = CheckpointReader(checkpoint_file)
     
     print(f"Monitoring progress (Total: {total_files} files)")
     
     try:
         while True:
-            if os.path.exists(checkpoint_file):
-                with open(checkpoint_file, 'r') as f:
-                    data = json.load(f)
-                    processed = len(data.get('processed', []))
-                    
-                    if processed != last_count:
-                        progress.update(processed)
-                        last_count = processed
-                        
-                        if processed >= total_files:
-                            print("\nProcessing completed!")
-                            break
+            # Cheap stat while idle; only newly appended records get parsed
+            processed = reader.poll()
+            
+            if processed != last_count:
+                progress.update(processed)
+                last_count = processed
+                
+                if processed >= total_files:
+                    print("\nProcessing completed!")
+                    break
             
             time.sleep(0.5)
             
@@ -88,11 +125,16 @@ def generate_report(checkpoint_file, output_file=None):
         print(f"Checkpoint file not found: {checkpoint_file}")
         return
     
-    with open(checkpoint_file, 'r') as f:
-        data = json.load(f)
+    with open(checkpoint_file, 'rb') as f:
+        is_log = f.read(len(MAGIC)) == MAGIC
     
-    processed = data.get('processed', [])
-    timestamp = data.get('timestamp', 'Unknown')
+    processed = read_checkpoint(checkpoint_file)
+    if is_log:
+        # Appended every few records, so the mtime is the last update
+        timestamp = datetime.fromtimestamp(os.path.getmtime(checkpoint_file)).strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        with open(checkpoint_file, 'r') as f:
+            timestamp = json.load(f).get('timestamp', 'Unknown')
     
     report = f"""CSV Processing Report
 ====================
@@ -150,7 +192,4 @@ def main():
 
 
 if __name__ == "__main__":
-    # Import glob only if needed
-    if len(sys.argv) > 1 and sys.argv[1] == 'monitor':
-        import glob
     main()
\ No newline at end of file
@@ -2,17 +2,43 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import csv
+import mmap
 import shutil
-import threading
+import tempfile
 import argparse
 import time
+import multiprocessing as mp
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple, Dict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Iterable, List, Tuple, Dict
 from dataclasses import dataclass
 from tqdm import tqdm
 
+from csv_processor import _pool_context
+
+try:
+    import liburing
+except ImportError:  # Optional: batched io_uring I/O on Linux
+    liburing = None
+
+# Bytes read per step when streaming file content
+CHUNK_SIZE = 1 << 20
+
+# Changed spans longer than this are split into byte ranges handled by a thread pool
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+RANGE_BYTES = 16 * 1024 * 1024
+RANGE_WORKERS = 8
+
+# Files handed to a worker at a time when the file list is still being scanned
+STREAM_CHUNKSIZE = 64
+
+# Files per io_uring round trip; bigger files go through the streaming path
+URING_DEPTH = 64
+URING_MAX_BYTES = 4 * 1024 * 1024
+
 @dataclass
 class ProcessResult:
     """Result of processing a single file"""
@@ -23,44 +49,234 @@ class ProcessResult:
     new_name: str = ""
 
 class ProcessStats:
-    """Thread-safe statistics collection"""
+    """
+    Statistics collection
+    Only the main thread's result loop updates it (workers just return results), so no lock is needed
+    """
     def __init__(self):
-        self._lock = threading.Lock()
         self.total_files = 0
         self.success_count = 0
         self.error_count = 0
         self.renamed_count = 0
     
     def add_result(self, result: ProcessResult):
-        with self._lock:
-            if result.success:
-                self.success_count += 1
-                if result.new_name and result.new_name != result.original_name:
-                    self.renamed_count += 1
-            else:
-                self.error_count += 1
+        if result.success:
+            self.success_count += 1
+            if result.new_name and result.new_name != result.original_name:
+                self.renamed_count += 1
+        else:
+            self.error_count += 1
+
+def _self_overlaps(needle):
+    """
+    True if two occurrences of needle can overlap (b'aa' in b'aaa'), so which ones
+    bytes.replace takes depends on where a left-to-right scan started
+    """
+    return any(needle[:k] == needle[-k:] for k in range(1, len(needle)))
+
+def _iter_replaced_chunks(infile, old_bytes, new_bytes, offset=0, limit=None):
+    """
+    Yield (offset, original, replaced) for each chunk of infile, reading from its current position
+    Stops after limit bytes when given. A match is never split across two chunks
+    """
+    keep = len(old_bytes) - 1
+    # Each buf starts where a scan of the whole file is between matches, so scanning buf
+    # from its start finds the same matches; otherwise only one starting in the last
+    # keep bytes before the cut can reach past it
+    overlaps = _self_overlaps(old_bytes)
+    carry = b''
+    remaining = limit
+    
+    while True:
+        if remaining is None:
+            chunk = infile.read(CHUNK_SIZE)
+        else:
+            chunk = infile.read(min(CHUNK_SIZE, remaining)) if remaining else b''
+            remaining -= len(chunk)
+        buf = carry + chunk
+        if not chunk:
+            # Shorter than the pattern, so nothing left to replace
+            if buf:
+                yield offset, buf, buf
+            return
+        if len(buf) <= keep:
+            carry = buf
+            continue
+        
+        # Hold back the tail that could be the start of a match, unless a match spans the cut
+        cut = len(buf) - keep
+        if keep:
+            pos = buf.find(old_bytes, 0 if overlaps else max(0, cut - keep))
+            while pos != -1 and pos < cut:
+                end = pos + len(old_bytes)
+                if end > cut:
+                    cut = end
+                    break
+                pos = buf.find(old_bytes, end)
+        
+        head, carry = buf[:cut], buf[cut:]
+        yield offset, head, head.replace(old_bytes, new_bytes)
+        offset += len(head)
+
+def _replace_range(fd, start, end, size, old_bytes, new_bytes):
+    """
+    Replace inside [start, end) of the file, read with pread so ranges share no file position
+    A match straddling start belongs to the previous range, one straddling end to this one
+    Returns (offset, original, replaced) like _iter_replaced_chunks
+    """
+    keep = len(old_bytes) - 1
+    lo = max(0, start - keep)
+    buf = os.pread(fd, min(size, end + keep) - lo, lo)
+    begin, stop = start - lo, end - lo
+    if keep:
+        # Both neighbours look at the same bytes around a cut, so they agree on who owns a match
+        m = buf.find(old_bytes, max(0, begin - keep), begin + keep)
+        if m != -1 and m < begin:
+            begin = m + len(old_bytes)
+        m = buf.find(old_bytes, max(0, stop - keep), stop + keep)
+        if m != -1 and m < stop:
+            stop = m + len(old_bytes)
+    
+    original = buf[begin:stop]
+    return lo + begin, original, original.replace(old_bytes, new_bytes)
+
+def _iter_span_chunks(infile, old_bytes, new_bytes, first, last_end, size):
+    """
+    Yield (offset, original, replaced) covering [first, last_end) in file order
+    Spans beyond PARALLEL_MIN_BYTES are cut into byte ranges and read by a thread pool
+    """
+    workers = min(os.cpu_count() or 1, RANGE_WORKERS)
+    # A range can't tell where overlapping matches line up without scanning everything before it
+    if last_end - first < PARALLEL_MIN_BYTES or workers < 2 or _self_overlaps(old_bytes):
+        infile.seek(first)
+        yield from _iter_replaced_chunks(infile, old_bytes, new_bytes, first, last_end - first)
+        return
+    
+    cuts = list(range(first, last_end, RANGE_BYTES)) + [last_end]
+    spans = list(zip(cuts, cuts[1:]))
+    fd = infile.fileno()
+    
+    def work(span):
+        return _replace_range(fd, span[0], span[1], size, old_bytes, new_bytes)
+    
+    # A window of ranges at a time keeps memory at a few RANGE_BYTES per thread
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(spans), workers * 2):
+            yield from executor.map(work, spans[i:i + workers * 2])
+
+def _fadvise(fd, advice):
+    """
+    Page-cache hint for the whole file (an os.POSIX_FADV_* name); silently skipped where unsupported
+    """
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+        except OSError:
+            pass
 
-def replace_character_in_csv_content(file_path, old_char='ԥ', new_char='豫'):
+def _find_bounds(file_path, needle):
+    """
+    (start of first match, end of last match, file size), or None if needle never occurs
+    """
+    with open(file_path, 'rb') as infile:
+        size = os.fstat(infile.fileno()).st_size
+        if size == 0:
+            return None
+        # Read front to back once: more readahead
+        _fadvise(infile.fileno(), 'POSIX_FADV_SEQUENTIAL')
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            first = mm.find(needle)
+            if first < 0:
+                # Left untouched and not read again: free its cache pages for the next files
+                _fadvise(infile.fileno(), 'POSIX_FADV_DONTNEED')
+                return None
+            return first, mm.rfind(needle) + len(needle), size
+
+def _copy_range(infile, outfile, src_offset, dst_offset, length):
+    """
+    Copy length bytes unchanged, in-kernel where the platform allows
+    Leaves both files positioned just past the copied range
+    """
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < length:
+                n = os.copy_file_range(infile.fileno(), outfile.fileno(), length - copied,
+                                       src_offset + copied, dst_offset + copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            pass  # e.g. cross-filesystem on older kernels
+    
+    infile.seek(src_offset + copied)
+    outfile.seek(dst_offset + copied)
+    while copied < length:
+        data = infile.read(min(CHUNK_SIZE, length - copied))
+        if not data:
+            break
+        outfile.write(data)
+        copied += len(data)
+
+def replace_character_in_csv_content(file_path, old_char='ԥ', new_char='豫', dest_path=None):
     """
     Replace character in CSV file content
+    Works on raw UTF-8 bytes in fixed-size chunks, so memory use stays flat
+    (bytes(mmap).replace() would hold the whole file and its replaced copy at once)
+    With dest_path the result ends up there instead and file_path is gone afterwards
     """
-    temp_file = str(file_path) + '.tmp'
+    old_bytes = old_char.encode('utf-8')
+    new_bytes = new_char.encode('utf-8')
+    dest_path = str(dest_path if dest_path is not None else file_path)
+    moved = dest_path != str(file_path)
+    temp_file = None
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as infile, \
-             open(temp_file, 'w', encoding='utf-8', newline='') as outfile:
-            
-            content = infile.read()
-            updated_content = content.replace(old_char, new_char)
-            outfile.write(updated_content)
+        # Nothing to replace: leave the content alone (it may only need renaming)
+        bounds = _find_bounds(file_path, old_bytes)
+        if bounds is None:
+            if moved:
+                os.rename(file_path, dest_path)
+            return True
+        first, last_end, size = bounds
         
-        # Replace original file with updated content
-        shutil.move(temp_file, file_path)
+        if len(old_bytes) == len(new_bytes):
+            # Same length: overwrite just the changed chunks in place, no temp file
+            with open(file_path, 'r+b', buffering=0) as infile:
+                for offset, original, replaced in _iter_span_chunks(infile, old_bytes, new_bytes,
+                                                                    first, last_end, size):
+                    if replaced != original:
+                        os.pwrite(infile.fileno(), replaced, offset)
+            if moved:
+                os.rename(file_path, dest_path)
+            return True
+        
+        # Temp file next to the destination, so the final replace is a same-filesystem rename
+        temp_fd, temp_file = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(dest_path)))
+        with open(file_path, 'rb') as infile, os.fdopen(temp_fd, 'wb') as outfile:
+            _fadvise(infile.fileno(), 'POSIX_FADV_SEQUENTIAL')
+            # Only the span between the first and last match is transformed,
+            # everything around it is copied as is
+            _copy_range(infile, outfile, 0, 0, first)
+            for _, _, replaced in _iter_span_chunks(infile, old_bytes, new_bytes, first, last_end, size):
+                outfile.write(replaced)
+            outfile.flush()
+            _copy_range(infile, outfile, last_end, outfile.tell(), size - last_end)
+        
+        # mkstemp creates the file as 0600; keep the original permissions
+        shutil.copymode(file_path, temp_file)
+        
+        # Replace original file with updated content (atomic, no per-file fsync)
+        os.replace(temp_file, dest_path)
+        if moved:
+            os.unlink(file_path)
         return True
         
     except Exception as e:
         # Clean up temp file if it exists
-        if os.path.exists(temp_file):
+        if temp_file and os.path.exists(temp_file):
             os.remove(temp_file)
         print(f"Error processing {file_path}: {e}")
         return False
@@ -98,18 +314,19 @@ def process_single_file(file_path: Path, old_char: str = 'ԥ', new_char: str = '
     )
     
     try:
-        # Step 1: Replace content if it's a CSV file
+        # Work out the final name first, so a CSV is rewritten straight to it
+        new_path = file_path.with_name(file_path.name.replace(old_char, new_char))
+        
         if file_path.suffix.lower() == '.csv':
-            if not replace_character_in_csv_content(file_path, old_char, new_char):
+            if not replace_character_in_csv_content(file_path, old_char, new_char, new_path):
                 result.error_msg = "Failed to replace CSV content"
                 return result
+        elif new_path != file_path:
+            os.rename(file_path, new_path)
         
-        # Step 2: Rename file if needed
-        if old_char in file_path.name:
-            new_path = rename_file_with_character_replacement(file_path, old_char, new_char, verbose)
-            result.new_name = Path(new_path).name
-        else:
-            result.new_name = file_path.name
+        result.new_name = new_path.name
+        if verbose and new_path != file_path:
+            print(f"Renamed: {file_path.name} -> {new_path.name}")
         
         result.success = True
         return result
@@ -118,57 +335,337 @@ def process_single_file(file_path: Path, old_char: str = 'ԥ', new_char: str = '
         result.error_msg = str(e)
         return result
 
-def process_files_parallel(files: List[Path], old_char: str = 'ԥ', new_char: str = '豫', max_workers: int = None, verbose: bool = False) -> ProcessStats:
+class _Ring:
     """
-    Process files in parallel using ThreadPoolExecutor
+    Minimal io_uring driver: each run() submits one round of linked SQE chains and waits for all of them
     """
-    if not files:
-        return ProcessStats()
+    def __init__(self, entries: int):
+        self.ring = liburing.Ring()
+        self.cqe = liburing.Cqe()
+        liburing.io_uring_queue_init(entries, self.ring)
+    
+    def close(self):
+        liburing.io_uring_queue_exit(self.ring)
     
+    def run(self, chains):
+        """
+        chains: list of [(prep, args, link_flags), ...], each op filled in as prep(sqe, *args)
+        Returns the results per chain, each an int or the OSError it failed with
+        """
+        results = [[None] * len(chain) for chain in chains]
+        count = 0
+        for i, chain in enumerate(chains):
+            for j, (prep, args, flags) in enumerate(chain):
+                sqe = liburing.io_uring_get_sqe(self.ring)
+                prep(sqe, *args)
+                sqe.user_data = (i << 8) | j
+                if flags:
+                    liburing.io_uring_sqe_set_flags(sqe, flags)
+                count += 1
+        if not count:
+            return results
+        
+        liburing.io_uring_submit_and_wait(self.ring, count)
+        for _ in range(count):
+            liburing.io_uring_wait_cqe(self.ring, self.cqe)
+            entry = self.cqe[0]
+            key = entry.user_data
+            try:
+                res = entry.res
+            except OSError as e:
+                res = e
+            results[key >> 8][key & 0xFF] = res
+            liburing.io_uring_cqe_seen(self.ring, entry)
+        return results
+
+# Two SQEs per file at most in any round
+_RING_ENTRIES = URING_DEPTH * 2
+_ring = None
+_ring_pid = None
+
+def _worker_ring() -> _Ring:
+    """
+    The calling process's ring, created on first use (a forked child never reuses its parent's)
+    """
+    global _ring, _ring_pid
+    if _ring is None or _ring_pid != os.getpid():
+        _ring = _Ring(_RING_ENTRIES)
+        _ring_pid = os.getpid()
+    return _ring
+
+def uring_available() -> bool:
+    """
+    True if liburing is installed and the kernel lets us set up a ring
+    """
+    if liburing is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        _Ring(_RING_ENTRIES).close()
+    except (OSError, RuntimeError):
+        return False  # Old kernel, or io_uring disabled by sysctl/seccomp
+    return True
+
+def _batched(iterable, size: int):
+    """
+    Yield lists of up to size items
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def process_batch_uring(files: List[Path], old_char: str = 'ԥ', new_char: str = '豫', verbose: bool = False) -> List[ProcessResult]:
+    """
+    Process a batch of files with five io_uring round trips instead of several syscalls per file
+    Rounds: open sources, read + close, open temp files, write + close, rename (+ unlink)
+    """
+    ring = _worker_ring()
+    old_bytes = old_char.encode('utf-8')
+    new_bytes = new_char.encode('utf-8')
+    link, hardlink = liburing.IOSQE_IO_LINK, liburing.IOSQE_IO_HARDLINK
+    
+    results = [ProcessResult(file_path=str(f), success=False, original_name=f.name) for f in files]
+    dests = [f.with_name(f.name.replace(old_char, new_char)) for f in files]
+    done = set()     # Failed, or finished outside the ring
+    contents = {}    # Index -> replaced bytes, for CSVs that changed
+    
+    def fail(i, error):
+        results[i].error_msg = str(error)
+        done.add(i)
+    
+    # Round 1: open every CSV
+    csvs = [i for i, f in enumerate(files) if f.suffix.lower() == '.csv']
+    opened = ring.run([[(liburing.io_uring_prep_open, (str(files[i]), os.O_RDONLY | os.O_CLOEXEC), 0)]
+                       for i in csvs])
+    reads = []
+    for i, (fd,) in zip(csvs, opened):
+        if isinstance(fd, OSError):
+            fail(i, fd)
+            continue
+        st = os.fstat(fd)
+        if st.st_size > URING_MAX_BYTES:
+            # Too big to hold whole: stream it like the regular path
+            os.close(fd)
+            results[i] = process_single_file(files[i], old_char, new_char, verbose)
+            done.add(i)
+            continue
+        reads.append((i, fd, bytearray(st.st_size), st.st_mode & 0o7777))
+    
+    # Round 2: read each file whole, closing it whatever the outcome
+    got = ring.run([[(liburing.io_uring_prep_read, (fd, buf, 0), hardlink),
+                     (liburing.io_uring_prep_close, (fd,), 0)]
+                    for _, fd, buf, _ in reads])
+    writes = []
+    for (i, _, buf, mode), (n, _) in zip(reads, got):
+        if isinstance(n, OSError):
+            fail(i, n)
+        elif n != len(buf):
+            fail(i, f"Short read: {n} of {len(buf)} bytes")
+        elif buf.find(old_bytes) != -1:
+            contents[i] = bytes(buf.replace(old_bytes, new_bytes))
+            writes.append((i, mode))
+    
+    # Round 3: temp file next to each destination, so the final rename stays on one filesystem
+    temps = {i: str(dests[i].with_name(f".{dests[i].name}.{os.getpid()}.tmp")) for i, _ in writes}
+    created = ring.run([[(liburing.io_uring_prep_open,
+                          (temps[i], os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, mode), 0)]
+                        for i, mode in writes])
+    pending = []
+    for (i, _), (fd,) in zip(writes, created):
+        if isinstance(fd, OSError):
+            fail(i, fd)
+        else:
+            pending.append((i, fd))
+    
+    # Round 4: write + close
+    wrote = ring.run([[(liburing.io_uring_prep_write, (fd, contents[i], 0), hardlink),
+                       (liburing.io_uring_prep_close, (fd,), 0)]
+                      for i, fd in pending])
+    discard = []
+    for (i, _), (n, _) in zip(pending, wrote):
+        if isinstance(n, OSError) or n != len(contents[i]):
+            fail(i, n if isinstance(n, OSError) else f"Short write: {n} of {len(contents[i])} bytes")
+            discard.append(i)
+    
+    # Round 5: move everything into place; a rewritten CSV drops its old name once the new one exists
+    moves = []
+    for i, f in enumerate(files):
+        if i in done:
+            continue
+        if i in contents:
+            if dests[i] != f:
+                chain = [(liburing.io_uring_prep_rename, (temps[i], str(dests[i])), link),
+                         (liburing.io_uring_prep_unlink, (str(f),), 0)]
+            else:
+                chain = [(liburing.io_uring_prep_rename, (temps[i], str(f)), 0)]
+        elif dests[i] != f:
+            chain = [(liburing.io_uring_prep_rename, (str(f), str(dests[i])), 0)]
+        else:
+            results[i].new_name = f.name
+            results[i].success = True
+            continue
+        moves.append((i, chain))
+    cleanup = [[(liburing.io_uring_prep_unlink, (temps[i],), 0)] for i in discard]
+    
+    for (i, _), res in zip(moves, ring.run([chain for _, chain in moves] + cleanup)):
+        error = next((r for r in res if isinstance(r, OSError)), None)
+        if error is not None:
+            fail(i, error)
+            continue
+        results[i].new_name = dests[i].name
+        results[i].success = True
+        if verbose and dests[i] != files[i]:
+            print(f"Renamed: {files[i].name} -> {dests[i].name}")
+    
+    return results
+
+def _iter_results(files: Iterable[Path], worker, max_workers: int, use_threads: bool, chunksize: int = None):
+    """
+    Yield worker results as files finish, from processes (default) or threads
+    files may be a generator: it is consumed while the workers run
+    """
+    if use_threads:
+        # Bounded number of files in flight, so a streamed scan is never drained up front
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for file_path in files:
+                pending.add(executor.submit(worker, file_path))
+                if len(pending) >= max_workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
+        return
+    
+    # Several chunks per worker amortizes IPC without leaving stragglers
+    if chunksize is not None:
+        pass
+    elif hasattr(files, '__len__'):
+        chunksize = max(1, len(files) // (max_workers * 4))
+    else:
+        chunksize = STREAM_CHUNKSIZE
+    # Same start method as every other pool here: fork on Linux, spawn elsewhere
+    with _pool_context().Pool(max_workers) as pool:
+        # The pool's task handler thread pulls from files, so scanning overlaps processing
+        yield from pool.imap_unordered(worker, files, chunksize=chunksize)
+
+def _fsync_directories(directories):
+    """
+    Flush each directory's entries (the renames) to disk, once per directory
+    Skipped where directories can't be opened (Windows)
+    """
+    flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+    for directory in directories:
+        try:
+            fd = os.open(directory or '.', flags)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass  # Some filesystems refuse fsync on a directory
+        finally:
+            os.close(fd)
+
+def process_files_parallel(files: Iterable[Path], old_char: str = 'ԥ', new_char: str = '豫', max_workers: int = None, verbose: bool = False,
+                           use_threads: bool = False, use_uring: bool = False) -> ProcessStats:
+    """
+    Process files in parallel using worker processes
+    use_threads switches to a ThreadPoolExecutor, e.g. for network filesystems
+    files can be a list or a lazy stream such as stream_files_to_process()
+    use_uring hands each worker batches that go through io_uring (needs liburing)
+    """
     stats = ProcessStats()
-    stats.total_files = len(files)
+    total = len(files) if hasattr(files, '__len__') else None
+    if total == 0:
+        return stats
     
-    # Use optimal number of workers for I/O bound tasks
+    # Content replacement holds the GIL, so processes scale with cores; threads only overlap I/O
     if max_workers is None:
-        max_workers = min(32, (os.cpu_count() or 1) + 4)
+        max_workers = min(32, (os.cpu_count() or 1) + 4) if use_threads else mp.cpu_count()
+    
+    count = f"{total} files" if total is not None else "files as they are found"
+    print(f"🚀 Processing {count} with {max_workers} {'threads' if use_threads else 'workers'}...")
+    
+    if use_uring and not use_threads and not uring_available():
+        print("⚠️ io_uring not available (needs liburing and Linux 5.6+), using regular I/O")
+        use_uring = False
     
-    print(f"🚀 Processing {len(files)} files with {max_workers} workers...")
+    if use_uring and not use_threads:
+        print(f"⚡ Using io_uring batches of {URING_DEPTH} files")
+        worker = partial(process_batch_uring, old_char=old_char, new_char=new_char, verbose=verbose)
+        results = (result
+                   for batch in _iter_results(_batched(files, URING_DEPTH), worker, max_workers, False, chunksize=1)
+                   for result in batch)
+    else:
+        worker = partial(process_single_file, old_char=old_char, new_char=new_char, verbose=verbose)
+        results = _iter_results(files, worker, max_workers, use_threads)
+    
+    touched = set()  # Directories holding a renamed or rewritten file
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_file = {
-            executor.submit(process_single_file, file_path, old_char, new_char, verbose): file_path 
-            for file_path in files
-        }
+    # Use tqdm to display progress
+    with tqdm(total=total, desc="⚙️ Processing files", 
+              unit="files", ncols=100,
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
         
-        # Use tqdm to display progress
-        with tqdm(total=len(files), desc="⚙️ Processing files", 
-                  unit="files", ncols=100,
-                  bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+        # Process completed tasks
+        for result in results:
+            stats.total_files += 1
+            stats.add_result(result)
+            if result.success:
+                touched.add(os.path.dirname(result.file_path))
             
-            # Process completed tasks
-            for future in as_completed(future_to_file):
-                result = future.result()
-                stats.add_result(result)
-                
-                # Update progress bar
-                pbar.update(1)
-                
-                # Update real-time statistics
-                pbar.set_postfix({
-                    'Success': stats.success_count,
-                    'Errors': stats.error_count,
-                    'Renamed': stats.renamed_count
-                })
-                
-                # Use tqdm.write for error and rename messages to avoid interfering with progress bar
-                if not result.success:
-                    tqdm.write(f"❌ ERROR processing {result.file_path}: {result.error_msg}")
-                elif verbose and result.new_name != result.original_name:
-                    tqdm.write(f"📝 Renamed: {result.original_name} → {result.new_name}")
+            # Update progress bar
+            pbar.update(1)
+            
+            # Update real-time statistics
+            pbar.set_postfix({
+                'Success': stats.success_count,
+                'Errors': stats.error_count,
+                'Renamed': stats.renamed_count
+            })
+            
+            # Use tqdm.write for error and rename messages to avoid interfering with progress bar
+            if not result.success:
+                tqdm.write(f"❌ ERROR processing {result.file_path}: {result.error_msg}")
+            elif verbose and result.new_name != result.original_name:
+                tqdm.write(f"📝 Renamed: {result.original_name} → {result.new_name}")
+    
+    # One fsync per touched directory at the end instead of one per file,
+    # and without flushing every other dirty file on the machine like os.sync()
+    _fsync_directories(touched)
     
     return stats
 
+def iter_target_files(root, needle: str):
+    """
+    Yield paths of files under root whose name contains needle
+    Uses os.scandir dirents directly: no Path objects or extra stat() for non-matching entries
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            entries = list(it)
+        
+        files = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            else:
+                files.append(entry)
+        
+        # One C-level find over the whole directory decides if any name needs a closer look
+        if needle not in '\x00'.join([entry.name for entry in files]):
+            continue
+        for entry in files:
+            if needle in entry.name and entry.is_file(follow_symlinks=False):
+                yield entry.path
+
 def collect_files_to_process(processed_dir: Path, old_char: str) -> List[Path]:
     """
     Collect all files that need processing
@@ -178,19 +675,40 @@ def collect_files_to_process(processed_dir: Path, old_char: str) -> List[Path]:
     if processed_dir.exists():
         print(f"🔍 Scanning directory: {processed_dir}")
         
-        # First pass to count total files for progress bar
-        all_paths = list(processed_dir.rglob("*"))
-        
-        with tqdm(all_paths, desc="📁 Scanning files", unit="files", ncols=100) as pbar:
-            for file_path in pbar:
-                if file_path.is_file() and old_char in file_path.name:
-                    files_to_process.append(file_path)
-                    pbar.set_postfix({'Found': len(files_to_process)})
+        # Single streaming pass; the total isn't known up front, so the bar counts matches
+        with tqdm(desc="📁 Scanning files", unit="files", ncols=100) as pbar:
+            for path in iter_target_files(processed_dir, old_char):
+                files_to_process.append(Path(path))
+                if len(files_to_process) % 1024 == 0:
+                    pbar.update(1024)
+            pbar.update(len(files_to_process) % 1024)
         
         print(f"✅ Found {len(files_to_process)} files that need processing")
     
     return files_to_process
 
+def stream_files_to_process(processed_dir: Path, old_char: str, new_char: str) -> Iterable[Path]:
+    """
+    Files that need processing, produced lazily so workers start before the scan ends
+    """
+    if old_char in new_char:
+        # A renamed file still matches and the walk could hand it out twice: scan first
+        return collect_files_to_process(processed_dir, old_char)
+    
+    print(f"🔍 Scanning directory: {processed_dir} (streaming to workers)")
+    return map(Path, iter_target_files(processed_dir, old_char))
+
+def print_summary(stats: ProcessStats):
+    """
+    Print the end-of-run statistics
+    """
+    print(f"\n📊 === Processing Summary ===")
+    print(f"📁 Total files: {stats.total_files}")
+    print(f"✅ Successfully processed: {stats.success_count}")
+    print(f"📝 Files renamed: {stats.renamed_count}")
+    if stats.error_count > 0:
+        print(f"❌ Errors: {stats.error_count}")
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
@@ -223,7 +741,11 @@ Usage Examples:
     parser.add_argument('-n', '--new-char', type=str, default='豫',
                        help='Replacement character (default: 豫)')
     parser.add_argument('-w', '--workers', type=int, default=None,
-                       help='Number of worker threads (default: auto-detect)')
+                       help='Number of worker processes (default: auto-detect)')
+    parser.add_argument('-T', '--threads', action='store_true',
+                       help='Use threads instead of processes (e.g. on network filesystems)')
+    parser.add_argument('--uring', action='store_true',
+                       help='Batch file I/O through io_uring (needs liburing; helps on high-latency filesystems)')
     parser.add_argument('-t', '--target-csv', type=str, default='ԥN00775D.csv',
                        help='Specific CSV file to process (default: ԥN00775D.csv)')
     parser.add_argument('--dry-run', action='store_true',
@@ -254,6 +776,7 @@ def main():
     old_char = args.old_char
     new_char = args.new_char
     max_workers = args.workers
+    use_threads = args.threads
     dry_run = args.dry_run
     verbose = args.verbose
     
@@ -313,13 +836,13 @@ def main():
     if processed_dir.exists():
         print(f"Processing files in directory: {processed_dir}")
         
-        # Collect all files that need processing
-        files_to_process = collect_files_to_process(processed_dir, old_char)
-        
-        print(f"Found {len(files_to_process)} files to process")
-        
-        if files_to_process:
-            if dry_run:
+        if dry_run:
+            # Collect all files that need processing
+            files_to_process = collect_files_to_process(processed_dir, old_char)
+            
+            print(f"Found {len(files_to_process)} files to process")
+            
+            if files_to_process:
                 print("=== DRY RUN: Files that would be processed ===")
                 for file_path in files_to_process:
                     old_name = file_path.name
@@ -330,18 +853,17 @@ def main():
                         print(f"  Would process: {old_name}")
                 print(f"Total files that would be processed: {len(files_to_process)}")
             else:
-                # Process files in parallel
-                stats = process_files_parallel(files_to_process, old_char, new_char, max_workers, verbose)
-                
-                # Print summary
-                print(f"\n📊 === Processing Summary ===")
-                print(f"📁 Total files: {stats.total_files}")
-                print(f"✅ Successfully processed: {stats.success_count}")
-                print(f"📝 Files renamed: {stats.renamed_count}")
-                if stats.error_count > 0:
-                    print(f"❌ Errors: {stats.error_count}")
+                print("No files found with the target character")
         else:
-            print("No files found with the target character")
+            # Process files in parallel, straight from the directory scan
+            stats = process_files_parallel(stream_files_to_process(processed_dir, old_char, new_char),
+                                           old_char, new_char, max_workers, verbose, use_threads,
+                                           args.uring)
+            
+            if stats.total_files:
+                print_summary(stats)
+            else:
+                print("No files found with the target character")
     else:
         print(f"Warning: Processed directory not found: {processed_dir}")
         
@@ -354,25 +876,22 @@ def main():
             print(f"Creating processed directory: {processed_dir}")
             processed_dir.mkdir(parents=True, exist_ok=True)
             
-            # Copy CSV files to processed directory
-            for csv_file in csv_files:
-                dest_file = processed_dir / csv_file.name
-                shutil.copy2(csv_file, dest_file)
-                if verbose:
-                    print(f"Copied: {csv_file.name} -> {dest_file}")
+            # Copy CSV files to processed directory; copies are I/O-bound,
+            # so threads keep several requests in flight at once
+            copy_workers = min(16, (os.cpu_count() or 1) * 2)
+            dest_files = [processed_dir / csv_file.name for csv_file in csv_files]
+            with ThreadPoolExecutor(max_workers=copy_workers) as executor:
+                for csv_file, dest_file in zip(csv_files, executor.map(shutil.copy2, csv_files, dest_files)):
+                    if verbose:
+                        print(f"Copied: {csv_file.name} -> {dest_file}")
             
             # Now process the copied files
-            files_to_process = collect_files_to_process(processed_dir, old_char)
-            if files_to_process:
-                print(f"⚙️ Processing {len(files_to_process)} copied files...")
-                stats = process_files_parallel(files_to_process, old_char, new_char, max_workers, verbose)
-                
-                print(f"\n📊 === Processing Summary ===")
-                print(f"📁 Total files: {stats.total_files}")
-                print(f"✅ Successfully processed: {stats.success_count}")
-                print(f"📝 Files renamed: {stats.renamed_count}")
-                if stats.error_count > 0:
-                    print(f"❌ Errors: {stats.error_count}")
+            print("⚙️ Processing copied files...")
+            stats = process_files_parallel(stream_files_to_process(processed_dir, old_char, new_char),
+                                           old_char, new_char, max_workers, verbose, use_threads,
+                                           args.uring)
+            if stats.total_files:
+                print_summary(stats)
         elif csv_files and dry_run:
             print(f"(DRY RUN) Would create directory: {processed_dir}")
             print("(DRY RUN) Would copy the following CSV files:")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Regression tests for csv_processor.remove_column on malformed and quoted input
+The reference is csv.reader: the output must parse to the input rows minus the column
+Run: python -m unittest test_csv_processor
+"""
+
+import csv
+import io
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+import csv_processor
+
+
+CASES = {
+    'stray_quote': 'id,a,c\n1,5" pipe,x\n2,y,z\n3,w,v\n',
+    'stray_quote_crlf': 'id,a,c\r\n1,5" pipe,x\r\n2,y,z\r\n',
+    'text_after_closing_quote': 'id,a,c\n1,"ab"c,x\n2,y,z\n',
+    'unterminated_quote': 'id,a,c\n1,"open,x\n2,y,z\n',
+    'quoted_comma_and_newline': 'id,a,c\n"1,5",x,"multi\nline"\n2,"say ""hi""",z\n',
+    'quoted_first_field': '"id",a,c\n"1",x,y\n',
+    'empty_quoted_field': 'id,a,c\n"",x,""\n',
+}
+
+
+def expected_rows(text, column_index):
+    """What csv.reader makes of text, minus column_index."""
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    for row in rows:
+        if len(row) > column_index:
+            row.pop(column_index)
+    return rows
+
+
+class RemoveColumnTest(unittest.TestCase):
+    """remove_column through whichever strategy the current build picks."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def check(self, name, column_index):
+        text = CASES[name]
+        path = os.path.join(self.tmpdir, f'{name}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        
+        success, error = csv_processor.remove_column(path, column_index)
+        self.assertTrue(success, error)
+        with open(path, newline='', encoding='utf-8') as f:
+            got = list(csv.reader(f))
+        self.assertEqual(got, expected_rows(text, column_index), name)
+    
+    def test_cases(self):
+        for name in CASES:
+            for column_index in (0, 1):
+                with self.subTest(case=name, column=column_index):
+                    self.check(name, column_index)
+
+
+
+class TempFileTest(unittest.TestCase):
+    """Rewrites that go through a temp file and a rename."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'data.csv')
+        with open(self.path, 'wb') as f:
+            f.write(b'id,a\n1,y\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_keeps_permissions(self):
+        os.chmod(self.path, 0o640)
+        success, error = csv_processor.replace_bytes_in_file(self.path, b'y', b'Y')
+        self.assertTrue(success, error)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+    
+    def test_leftover_temp_name(self):
+        # What a run killed between link and rename used to leave behind
+        open(self.path + '.new', 'wb').close()
+        for old, new in ((b'y', b'Y'), (b'Y', b'z')):
+            success, error = csv_processor.replace_bytes_in_file(self.path, old, new)
+            self.assertTrue(success, error)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'id,a\n1,z\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['data.csv', 'data.csv.new'])
+
+
+class PurePythonTest(RemoveColumnTest):
+    """The same cases with the C module unavailable, so the byte loops run."""
+    
+    def setUp(self):
+        super().setUp()
+        self.native = csv_processor._native_strip
+        csv_processor._native_strip = None
+    
+    def tearDown(self):
+        csv_processor._native_strip = self.native
+        super().tearDown()
+    
+    def test_irregular_quotes_need_parser(self):
+        for name in ('stray_quote', 'stray_quote_crlf', 'text_after_closing_quote', 'unterminated_quote'):
+            with self.subTest(case=name):
+                self.assertIsNone(csv_processor._line_stripper(CASES[name].encode()))
+    
+    def test_unterminated_quote_needs_parser(self):
+        buf = CASES['unterminated_quote'].encode()
+        with self.assertRaises(csv_processor._NeedsParser):
+            b''.join(csv_processor._iter_stripped_quoted(buf))
+
+@unittest.skipIf(csv_processor._native_strip is None, '_csvstrip is not built')
+class NativeStripTest(unittest.TestCase):
+    """The C stripper only keeps files whose quotes open fields and are closed."""
+    
+    def test_irregular_quotes_are_refused(self):
+        for name in ('stray_quote', 'stray_quote_crlf', 'text_after_closing_quote', 'unterminated_quote'):
+            for column_index in (0, 1):
+                with self.subTest(case=name, column=column_index):
+                    data = CASES[name].encode('utf-8')
+                    self.assertIsNone(csv_processor._strip_native_bytes(data, column_index))
+    
+    def test_regular_quotes_are_spliced(self):
+        for name in ('quoted_comma_and_newline', 'quoted_first_field', 'empty_quoted_field'):
+            for column_index in (0, 1):
+                with self.subTest(case=name, column=column_index):
+                    out = csv_processor._strip_native_bytes(CASES[name].encode('utf-8'), column_index)
+                    self.assertIsNotNone(out)
+                    rows = list(csv.reader(io.StringIO(bytes(out).decode('utf-8'), newline='')))
+                    self.assertEqual(rows, expected_rows(CASES[name], column_index))
+
+@unittest.skipIf(csv_processor.pa_csv is None, 'pyarrow is not installed')
+class ArrowWriterTest(unittest.TestCase):
+    """Whatever the Arrow strategy writes must be byte-identical to the csv module's output."""
+    
+    TEXTS = [
+        'a,b,c\r\n1,"x,y",3\r\n',
+        'a,b,c\n1,2,3\n',
+        'a,b\n1,\n2,x\n',
+        'a,b,c\n1, padded ,3\n',
+    ]
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmpdir, 'in.csv')
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def write(self, strategy, text):
+        with open(self.input, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        out = os.path.join(self.tmpdir, strategy.__name__)
+        open(out, 'wb').close()
+        done = strategy(self.input, out, 0)
+        with open(out, 'rb') as f:
+            return done, f.read()
+    
+    def test_matches_csv_writer(self):
+        for text in self.TEXTS:
+            with self.subTest(text=text):
+                done, data = self.write(csv_processor._remove_column_arrow, text)
+                _, expected = self.write(csv_processor._remove_column_csv, text)
+                if done:
+                    self.assertEqual(data, expected)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Regression tests for replace_character's chunked replacement
+The reference is bytes.replace over the whole file
+Run: python -m unittest test_replace_character
+"""
+
+import io
+import itertools
+import tempfile
+import unittest
+
+import replace_character
+
+
+NEEDLES = [
+    (b'aa', b'b'),
+    (b'aba', b'X'),
+    (b'aaa', b'bbbb'),
+    ('ԥ'.encode('utf-8'), '豫'.encode('utf-8')),
+    (b'ab', b''),
+]
+
+
+def replaced(data, old_bytes, new_bytes, offset=0, limit=None):
+    """Run _iter_replaced_chunks over data and check the chunks line up."""
+    infile = io.BytesIO(data)
+    infile.seek(offset)
+    out = []
+    pos = offset
+    for chunk_offset, original, new in replace_character._iter_replaced_chunks(
+            infile, old_bytes, new_bytes, offset, limit):
+        assert chunk_offset == pos
+        pos += len(original)
+        out.append(new)
+    return b''.join(out)
+
+
+class ReplacedChunksTest(unittest.TestCase):
+    """Chunk boundaries must not change what bytes.replace would produce."""
+    
+    def setUp(self):
+        self.saved = {name: getattr(replace_character, name)
+                      for name in ('CHUNK_SIZE', 'PARALLEL_MIN_BYTES', 'RANGE_BYTES')}
+    
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(replace_character, name, value)
+    
+    def test_self_overlapping_needle(self):
+        replace_character.CHUNK_SIZE = 3
+        self.assertEqual(replaced(b'aaaa\n', b'aa', b'b'), b'bb\n')
+    
+    def test_against_bytes_replace(self):
+        for chunk_size in (1, 2, 3, 5):
+            replace_character.CHUNK_SIZE = chunk_size
+            for old_bytes, new_bytes in NEEDLES:
+                alphabet = b'ab\n' if old_bytes.isascii() else old_bytes[:1] + old_bytes + b','
+                for length in range(8):
+                    for data in itertools.product(alphabet, repeat=length):
+                        data = bytes(data)
+                        self.assertEqual(replaced(data, old_bytes, new_bytes),
+                                         data.replace(old_bytes, new_bytes),
+                                         (chunk_size, old_bytes, data))
+    
+    def test_span_ranges(self):
+        # Byte ranges read by the thread pool, or the sequential loop for overlapping needles
+        replace_character.CHUNK_SIZE = 4
+        replace_character.PARALLEL_MIN_BYTES = 1
+        replace_character.RANGE_BYTES = 3
+        data = b'xaaaaab\naabaaba' * 5
+        for old_bytes, new_bytes in NEEDLES[:3] + NEEDLES[4:]:
+            with tempfile.TemporaryFile() as f:
+                f.write(data)
+                chunks = replace_character._iter_span_chunks(f, old_bytes, new_bytes, 0, len(data), len(data))
+                self.assertEqual(b''.join(new for _, _, new in chunks),
+                                 data.replace(old_bytes, new_bytes), old_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
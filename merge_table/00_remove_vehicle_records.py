@@ -5,20 +5,55 @@
 """
 
 import os
+import re
 import sys
+import shutil
 import argparse
 import pandas as pd
+import numpy as np
 import multiprocessing as mp
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-import gc
+import heapq
 import psutil
 from typing import List, Set, Tuple, Optional, Dict
 import time
 from dataclasses import dataclass
-from functools import partial
 import logging
+from openpyxl import load_workbook
+from tqdm import tqdm
+
+from table_io import HAS_CALAMINE, pool_context, write_xlsx
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+# replace_sheet的临时文件后缀；find_xlsx_files会跳过残留的临时文件
+TMP_SUFFIX = '.tmp.xlsx'
+
+# 并行进度条的最小刷新间隔（秒）
+PROGRESS_INTERVAL = 0.1
+
+# 列名关键词：一个预编译正则一次扫描，代替逐个关键词的子串查找
+PLATE_COLUMN_RE = re.compile(r'车牌|plate|号牌', re.IGNORECASE)
+DATE_COLUMN_RE = re.compile(r'时间|date|日期', re.IGNORECASE)
+
+
+def replace_sheet(df: pd.DataFrame, file_path: str):
+    """先写到同目录的临时文件再os.replace替换，中途失败不会损坏原文件"""
+    tmp_path = file_path + TMP_SUFFIX  # 保留.xlsx后缀，openpyxl等写出器按后缀判断格式
+    try:
+        write_xlsx(df, tmp_path)  # 与其他脚本共用同一个流式写出器
+        shutil.copymode(file_path, tmp_path)  # 保留原文件权限
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 @dataclass
@@ -50,6 +85,13 @@ class VehicleDataProcessor:
     def __init__(self, vehicle_plates: Set[str], from_date: Optional[datetime] = None):
         self.vehicle_plates = vehicle_plates
         self.from_date = from_date
+        # Series.isin每次调用都会为车牌集合重建哈希表；Index的哈希表只在首次查询时建一次
+        # （有序定长数组+searchsorted实测并不更快，且定长'U'会截断超长的值造成误判）
+        # Arrow的is_in逐行更快，但每次调用都要为车牌集合建哈希表，只用于行数多的列
+        self._plate_value_set = pa.array(list(vehicle_plates), type=pa.string()) if pa is not None else None
+        self._plate_index = pd.Index(list(vehicle_plates), dtype=object)
+        # 立即建好Index的哈希表：fork出的worker直接共享，不必各自再建
+        self._plate_index.get_indexer(self._plate_index[:1])
         
     def extract_date_from_filename(self, filename: str) -> Optional[datetime]:
         """从文件名提取日期 (e.g., '0101.xlsx' -> datetime(2025, 1, 1))"""
@@ -65,19 +107,46 @@ class VehicleDataProcessor:
             pass
         return None
     
-    def extract_date_from_content(self, df: pd.DataFrame) -> Optional[datetime]:
-        """从数据内容中提取日期"""
-        for col in df.columns:
-            if any(keyword in str(col).lower() for keyword in ['时间', 'date', '日期']):
-                try:
-                    # 查找特殊格式: "2025/1/1 0:00:00---2025/1/1 0:00:00合计:"
-                    for value in df[col].dropna().head(10):
-                        value_str = str(value)
-                        if '---' in value_str and '合计' in value_str:
-                            date_part = value_str.split('---')[0].strip()
-                            return datetime.strptime(date_part.split()[0], '%Y/%m/%d')
-                except (ValueError, AttributeError):
-                    continue
+    def extract_date_from_file(self, file_path: str) -> Optional[datetime]:
+        """从数据内容中提取日期（openpyxl只读模式）：只读取日期列开头的少量非空单元格，不解析整个表"""
+        rows = self._iter_rows(file_path)
+        try:
+            header = next(rows, None)
+            if header is None:
+                return None
+            date_indexes = [i for i, col in enumerate(header) if DATE_COLUMN_RE.search(str(col))]
+            samples = {i: [] for i in date_indexes}
+            for row in rows if date_indexes else ():
+                for i in date_indexes:
+                    value = row[i] if i < len(row) else None
+                    if value is not None and value != '' and len(samples[i]) < 10:
+                        samples[i].append(value)
+                if all(len(values) >= 10 for values in samples.values()):
+                    break
+        finally:
+            rows.close()
+        return self._date_from_samples(samples.values())
+    
+    def extract_date_from_frame(self, df: pd.DataFrame) -> Optional[datetime]:
+        """从已读取的DataFrame中提取日期：与extract_date_from_file相同，取日期列开头的少量非空值"""
+        samples = []
+        for i, col in enumerate(df.columns):
+            if DATE_COLUMN_RE.search(str(col)):
+                values = df.iloc[:, i].dropna()
+                samples.append(values[values != ''].head(10).tolist())
+        return self._date_from_samples(samples)
+    
+    def _date_from_samples(self, samples) -> Optional[datetime]:
+        """按日期列依次查找特殊格式: "2025/1/1 0:00:00---2025/1/1 0:00:00合计:" """
+        for values in samples:
+            try:
+                for value in values:
+                    value_str = str(value)
+                    if '---' in value_str and '合计' in value_str:
+                        date_part = value_str.split('---')[0].strip()
+                        return datetime.strptime(date_part.split()[0], '%Y/%m/%d')
+            except (ValueError, AttributeError):
+                continue
         return None
     
     def should_process_file(self, file_path: str) -> bool:
@@ -93,39 +162,123 @@ class VehicleDataProcessor:
         # 如果文件名无法提取日期，则需要打开文件检查内容
         return True  # 延迟到内容检查时判断
     
+    def read_sheet(self, file_path: str) -> pd.DataFrame:
+        """读取第一个工作表：优先用calamine，否则用openpyxl只读模式逐行流式读取"""
+        if HAS_CALAMINE:
+            return pd.read_excel(file_path, engine='calamine')
+        
+        # 只读模式不构建整个工作簿的DOM，逐行产出单元格值
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return pd.DataFrame()
+            width = len(header)
+            data = [row[:width] + (None,) * (width - len(row)) for row in rows]
+        finally:
+            wb.close()
+        
+        # 与read_excel一致：去掉末尾的空行，空表头命名为 "Unnamed: i"
+        while data and all(value is None for value in data[-1]):
+            data.pop()
+        columns = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        return pd.DataFrame(data, columns=columns)
+    
+    def _iter_rows(self, file_path: str):
+        """用openpyxl只读模式逐行产出第一个工作表的单元格值（第一行是表头），不构建DataFrame"""
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+    
+    def find_plate_column(self, columns) -> Optional[int]:
+        """返回第一个车牌号列的位置，找不到时返回None"""
+        for i, col in enumerate(columns):
+            if PLATE_COLUMN_RE.search(str(col)):
+                return i
+        return None
+    
+    def plate_mask(self, plates: pd.Series) -> np.ndarray:
+        """返回车牌在待删除集合中的布尔掩码"""
+        if not pd.api.types.is_string_dtype(plates):
+            plates = plates.astype(str)
+        
+        # 建表开销与车牌数成正比，逐行节省的时间大约是它的数倍：行数不少于车牌数时改走Arrow
+        # 车牌很少时is_in本身已接近逐行比较的极限（1M行/12个车牌约23ms），无需另写专用内核
+        if self._plate_value_set is not None and len(plates) >= len(self._plate_value_set):
+            # Arrow字符串列可零拷贝转换；空值不在集合中，结果为False
+            matched = pc.is_in(pa.array(plates, type=pa.string()), value_set=self._plate_value_set)
+            return matched.to_numpy(zero_copy_only=False)
+        return self._plate_index.get_indexer(plates) >= 0
+    
+    def _plates_present(self, file_path: str) -> bool:
+        """
+        openpyxl只读模式下只读取车牌号列，发现第一个待删除车牌即返回True
+        找不到表头或车牌号列时也返回True，交给完整流程处理（报告空文件/缺列）
+        calamine没有按列读取，取任何一列都要解析整个工作表，因此calamine路径不做预扫描
+        """
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            header = next(ws.iter_rows(max_row=1, values_only=True), None)
+            index = self.find_plate_column(header) if header else None
+            if index is None:
+                return True
+            for (value,) in ws.iter_rows(min_row=2, min_col=index + 1, max_col=index + 1, values_only=True):
+                if value is not None and str(value) in self.vehicle_plates:
+                    return True
+            return False
+        finally:
+            wb.close()
+    
     def process_single_file(self, file_path: str) -> Tuple[bool, int, str]:
         """处理单个XLSX文件"""
         try:
-            # 读取Excel文件
-            df = pd.read_excel(file_path, engine='openpyxl')
+            # 如果有日期过滤且文件名无法确定日期，需要检查文件内容
+            check_content_date = self.from_date and not self.extract_date_from_filename(file_path)
+            
+            if HAS_CALAMINE:
+                # calamine读取任何部分都要解析整个工作表：只解析一次，日期检查和车牌匹配共用这份DataFrame
+                df = self.read_sheet(file_path)
+                if check_content_date:
+                    content_date = self.extract_date_from_frame(df)
+                    if content_date and content_date < self.from_date:
+                        return True, 0, "日期不符合过滤条件"
+            else:
+                # openpyxl只读模式可以只读日期列开头几行、只读车牌号列
+                if check_content_date:
+                    content_date = self.extract_date_from_file(file_path)
+                    if content_date and content_date < self.from_date:
+                        return True, 0, "日期不符合过滤条件"
+                
+                # 大多数文件不含待删除车牌：无匹配则不解析整个表
+                if not self._plates_present(file_path):
+                    return True, 0, "成功删除 0 条记录"
+                
+                # 读取Excel文件
+                df = self.read_sheet(file_path)
             
             if df.empty:
                 return True, 0, "空文件"
             
-            # 如果有日期过滤且文件名无法确定日期，检查文件内容
-            if self.from_date and not self.extract_date_from_filename(file_path):
-                content_date = self.extract_date_from_content(df)
-                if content_date and content_date < self.from_date:
-                    return True, 0, "日期不符合过滤条件"
-            
             # 查找车牌号列
-            plate_column = None
-            for col in df.columns:
-                if any(keyword in str(col).lower() for keyword in ['车牌', 'plate', '号牌']):
-                    plate_column = col
-                    break
-            
-            if plate_column is None:
+            plate_index = self.find_plate_column(df.columns)
+            if plate_index is None:
                 return False, 0, "未找到车牌号列"
+            plate_column = df.columns[plate_index]
             
             # 删除匹配的车牌记录
-            original_count = len(df)
-            df_filtered = df[~df[plate_column].astype(str).isin(self.vehicle_plates)]
-            deleted_count = original_count - len(df_filtered)
+            mask = self.plate_mask(df[plate_column])
+            deleted_count = int(mask.sum())
             
             if deleted_count > 0:
+                df_filtered = df[~mask]
+                # 写出前释放原表，峰值内存只剩过滤后的一份；引用计数归零即释放，无需gc.collect()
+                del df
                 # 保存修改后的文件
-                df_filtered.to_excel(file_path, index=False, engine='openpyxl')
+                replace_sheet(df_filtered, file_path)
             
             return True, deleted_count, f"成功删除 {deleted_count} 条记录"
             
@@ -133,10 +286,21 @@ class VehicleDataProcessor:
             return False, 0, f"处理失败: {str(e)}"
 
 
-def process_file_batch(file_paths: List[str], vehicle_plates: Set[str], 
-                      from_date: Optional[datetime] = None) -> Dict:
+# 每个子进程的处理器，由_init_worker在进程启动时设置一次
+_WORKER_STATE = {}
+
+
+def _init_worker(processor: VehicleDataProcessor):
+    """
+    进程池initializer：处理器每个worker只传输一次，而不是随每个任务pickle
+    fork时直接继承父进程建好的车牌集合和哈希表（写时复制共享），不在每个worker里重建一份
+    """
+    _WORKER_STATE['processor'] = processor
+
+
+def process_file_batch(file_paths: List[str]) -> Dict:
     """批量处理文件（子进程执行）"""
-    processor = VehicleDataProcessor(vehicle_plates, from_date)
+    processor = _WORKER_STATE['processor']
     results = {
         'processed': 0,
         'failed': 0,
@@ -167,23 +331,27 @@ class ParallelVehicleRemover:
         self.max_workers = max_workers or min(mp.cpu_count(), 8)
         self.memory_limit_bytes = memory_limit_gb * 1024 * 1024 * 1024
         self.stats = ProcessingStats()
+        self._process = psutil.Process()
         
     def _get_memory_usage(self) -> float:
         """获取当前内存使用率"""
-        process = psutil.Process()
-        return process.memory_info().rss
+        return self._process.memory_info().rss
     
     def _balance_workload(self, xlsx_files: List[str]) -> List[List[str]]:
-        """智能负载均衡 - 根据文件大小分配任务"""
+        """
+        智能负载均衡 - 根据文件大小分配任务
+        并行粒度是整个文件：只处理第一个工作表，解析本身受GIL限制，
+        按skiprows/nrows切片并行读取又会让每个切片重新解析整张表的XML
+        """
         if not xlsx_files:
             return []
             
-        # 获取文件大小
+        # 获取文件大小；解析耗时随行数超线性增长，按 size**1.1 加权
         file_weights = []
         for file_path in xlsx_files:
             try:
                 size = os.path.getsize(file_path)
-                file_weights.append((file_path, size))
+                file_weights.append((file_path, size ** 1.1))
             except OSError:
                 # 文件不存在或无法访问，跳过
                 continue
@@ -196,13 +364,14 @@ class ParallelVehicleRemover:
         
         # 贪心算法分配到各个worker
         workers = [[] for _ in range(self.max_workers)]
-        worker_loads = [0] * self.max_workers
+        # 最小堆 (负载, worker序号)：负载相同时取序号小的，与线性扫描结果一致
+        heap = [(0, i) for i in range(self.max_workers)]
         
         for file_path, size in file_weights:
             # 分配给当前负载最小的worker
-            min_idx = worker_loads.index(min(worker_loads))
+            load, min_idx = heapq.heappop(heap)
             workers[min_idx].append(file_path)
-            worker_loads[min_idx] += size
+            heapq.heappush(heap, (load + size, min_idx))
         
         # 过滤掉空的worker组
         return [worker for worker in workers if worker]
@@ -214,21 +383,25 @@ class ParallelVehicleRemover:
         
         print(f"🚀 并行处理开始 [Workers: {len(futures)}, Files: {total_files}]")
         
-        for future in as_completed(futures):
+        last_print = 0.0
+        for done, future in enumerate(as_completed(futures), 1):
             try:
                 result = future.result()
                 self.stats.processed_files += result['processed']
                 self.stats.failed_files += result['failed']
                 self.stats.total_records_deleted += result['total_deleted']
                 
-                # 输出进度
-                progress = (self.stats.processed_files + self.stats.failed_files) / total_files
-                memory_mb = self._get_memory_usage() / (1024 * 1024)
-                
-                print(f"\r📊 Progress: {'█' * int(progress * 20):<20} "
-                      f"{progress * 100:.1f}% ({self.stats.processed_files + self.stats.failed_files}/{total_files}) "
-                      f"⚡ {self.stats.processing_speed:.1f} files/sec "
-                      f"🧠 {memory_mb:.0f}MB", end='', flush=True)
+                # 输出进度：最多每PROGRESS_INTERVAL秒刷新一次，最后一个任务完成时总会刷新
+                now = time.monotonic()
+                if now - last_print >= PROGRESS_INTERVAL or done == len(futures):
+                    last_print = now
+                    progress = (self.stats.processed_files + self.stats.failed_files) / total_files
+                    memory_mb = self._get_memory_usage() / (1024 * 1024)
+                    
+                    print(f"\r📊 Progress: {'█' * int(progress * 20):<20} "
+                          f"{progress * 100:.1f}% ({self.stats.processed_files + self.stats.failed_files}/{total_files}) "
+                          f"⚡ {self.stats.processing_speed:.1f} files/sec "
+                          f"🧠 {memory_mb:.0f}MB", end='', flush=True)
                 
                 # 处理错误信息
                 if result['errors']:
@@ -256,13 +429,15 @@ class ParallelVehicleRemover:
             print("❌ 所有文件都无法访问")
             return self.stats
         
+        # 父进程里一次建好车牌集合和查找结构，worker共享
+        processor = VehicleDataProcessor(frozenset(vehicle_plates), from_date)
+        
         # 创建进程池并提交任务
-        with ProcessPoolExecutor(max_workers=len(file_groups)) as executor:
-            process_func = partial(process_file_batch, 
-                                 vehicle_plates=vehicle_plates, 
-                                 from_date=from_date)
-            
-            futures = [executor.submit(process_func, file_group) 
+        with ProcessPoolExecutor(max_workers=len(file_groups),
+                                 mp_context=pool_context(),
+                                 initializer=_init_worker,
+                                 initargs=(processor,)) as executor:
+            futures = [executor.submit(process_file_batch, file_group) 
                       for file_group in file_groups]
             
             # 监控进度
@@ -279,7 +454,7 @@ def load_vehicle_plates(csv_file: str) -> Set[str]:
         # 查找车牌号列
         plate_column = None
         for col in df.columns:
-            if any(keyword in str(col).lower() for keyword in ['车牌', 'plate', '号牌']):
+            if PLATE_COLUMN_RE.search(str(col)):
                 plate_column = col
                 break
         
@@ -307,7 +482,7 @@ def find_xlsx_files(data_dir: str) -> List[str]:
         print(f"❌ 数据目录不存在: {data_dir}")
         return []
     
-    xlsx_files = list(data_path.glob("*.xlsx"))
+    xlsx_files = [f for f in data_path.glob("*.xlsx") if not f.name.endswith(TMP_SUFFIX)]
     print(f"📁 在目录 {data_dir} 中找到 {len(xlsx_files)} 个XLSX文件")
     
     return [str(f) for f in xlsx_files]
@@ -384,7 +559,8 @@ def main():
         stats.total_files = len(xlsx_files)
         stats.start_time = start_time
         
-        for i, file_path in enumerate(xlsx_files, 1):
+        # tqdm自行限制刷新频率
+        for file_path in tqdm(xlsx_files, desc="处理进度", unit="file"):
             if processor.should_process_file(file_path):
                 success, deleted_count, message = processor.process_single_file(file_path)
                 if success:
@@ -393,10 +569,6 @@ def main():
                 else:
                     stats.failed_files += 1
                     logging.warning(f"{file_path}: {message}")
-            
-            # 简单进度显示
-            if i % 10 == 0 or i == len(xlsx_files):
-                print(f"处理进度: {i}/{len(xlsx_files)}")
     
     # 输出统计结果
     elapsed_time = time.time() - start_time
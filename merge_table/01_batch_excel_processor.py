@@ -9,6 +9,7 @@
 """
 
 import pandas as pd
+import numpy as np
 import re
 import sys
 import argparse
@@ -18,56 +19,75 @@ from multiprocessing import Pool, cpu_count
 from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
 
+from table_io import pool_context, read_columns, write_xlsx
+
+# 输出文件的临时文件后缀：保留.xlsx，写出器按后缀判断格式；find_excel_files会跳过残留的临时文件
+TMP_SUFFIX = '.tmp.xlsx'
+
+# 支持的日期格式合并为一个预编译的正则，一次扫描即可确定格式
+DATE_PATTERN = re.compile(
+    r'(?P<ymd>\d{4}/\d{1,2}/\d{1,2})'                   # 2025/1/3, 2025/11/30
+    r'|(?P<ymd_dash>\d{4}-\d{1,2}-\d{1,2})'             # 2025-1-3, 2025-11-30
+    r'|(?P<mdy>(?P<m>\d{1,2})/(?P<d>\d{1,2})/(?P<y>\d{4}))'  # 1/3/2025, 11/30/2025
+)
+
 def clean_date_format(date_str):
     """增强的日期格式清理函数"""
     if pd.isna(date_str) or not date_str:
         return date_str
     
-    # 支持多种日期格式：年/月/日
-    patterns = [
-        r'(\d{4}/\d{1,2}/\d{1,2})',  # 2025/1/3, 2025/11/30
-        r'(\d{4}-\d{1,2}-\d{1,2})',  # 2025-1-3, 2025-11-30  
-        r'(\d{1,2}/\d{1,2}/\d{4})'   # 1/3/2025, 11/30/2025
-    ]
-    
-    date_string = str(date_str)
-    
-    for pattern in patterns:
-        match = re.search(pattern, date_string)
-        if match:
-            date_part = match.group(1)
-            # 统一转换为年/月/日格式
-            if '/' in date_part and len(date_part.split('/')[0]) == 4:
-                return date_part  # 已经是年/月/日格式
-            elif '-' in date_part:
-                return date_part.replace('-', '/')  # 转换年-月-日为年/月/日
-            elif '/' in date_part and len(date_part.split('/')[2]) == 4:
-                # 月/日/年转换为年/月/日
-                parts = date_part.split('/')
-                return f"{parts[2]}/{parts[0]}/{parts[1]}"
-    
-    return date_str
+    match = DATE_PATTERN.search(str(date_str))
+    if not match:
+        return date_str
+    
+    # 统一转换为年/月/日格式
+    kind = match.lastgroup
+    if kind == 'ymd':
+        return match.group('ymd')  # 已经是年/月/日格式
+    if kind == 'ymd_dash':
+        return match.group('ymd_dash').replace('-', '/')  # 转换年-月-日为年/月/日
+    # 月/日/年转换为年/月/日
+    return f"{match.group('y')}/{match.group('m')}/{match.group('d')}"
+
+def clean_date_column(series):
+    """按列清理日期：日期列重复值很多，只对每个不同的值调用一次clean_date_format"""
+    codes, uniques = pd.factorize(series)
+    cleaned = np.array([clean_date_format(value) for value in uniques], dtype=object)
+    values = cleaned.take(codes)
+    
+    # factorize把空值编码为-1，保留原值
+    missing = codes < 0
+    if missing.any():
+        values[missing] = series.to_numpy(dtype=object)[missing]
+    return pd.Series(values, index=series.index, name=series.name)
+
+def read_excel_columns(input_file, keep_columns):
+    """只读取前keep_columns列（0表示全部列）；列数不足时读取全部列"""
+    if keep_columns > 0:
+        try:
+            return pd.read_excel(input_file, usecols=list(range(keep_columns)))
+        except ValueError:
+            pass  # usecols越界：表格列数少于keep_columns
+    return pd.read_excel(input_file)
 
 def process_single_excel(file_info):
     """处理单个Excel文件的函数，用于并行处理"""
     input_file, output_dir, keep_columns = file_info
     
     try:
-        # 读取Excel文件
-        df = pd.read_excel(input_file)
-        original_shape = df.shape
+        # 读取Excel文件，只保留指定列数
+        df = read_excel_columns(input_file, keep_columns)
+        # df只含保留的列，原始列数从表头读取
+        original_shape = (len(df), len(read_columns(input_file))) if keep_columns > 0 else df.shape
         
-        # 保留指定列数
-        if keep_columns > 0:
-            df_processed = df.iloc[:, 0:keep_columns].copy()
-        else:
-            df_processed = df.copy()
+        # 日期列清理时整列替换，不会改动其它列，无需复制
+        df_processed = df
         
         # 清理日期格式
         date_columns = ['日期', 'date', 'Date', 'DATE']
         for col in df_processed.columns:
             if any(date_keyword in col for date_keyword in date_columns):
-                df_processed[col] = df_processed[col].apply(clean_date_format)
+                df_processed[col] = clean_date_column(df_processed[col])
                 break
         
         # 生成输出文件名
@@ -80,8 +100,15 @@ def process_single_excel(file_info):
         # 确保输出目录存在
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # 保存处理后的文件
-        df_processed.to_excel(output_path, index=False)
+        # 保存处理后的文件：先写临时文件再os.replace，中途失败不会留下半个输出文件
+        tmp_path = output_path.with_name(output_path.name + TMP_SUFFIX)
+        try:
+            write_xlsx(df_processed, tmp_path)  # 与其他脚本共用同一个流式写出器
+            os.replace(tmp_path, output_path)
+        except Exception:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
         
         result = {
             'file': str(input_file),
@@ -105,18 +132,31 @@ def process_single_excel(file_info):
             'columns': None
         }
 
-def find_excel_files(directory, pattern="*.xlsx"):
-    """查找目录中的Excel文件"""
+def find_excel_files(directory, recursive=True):
+    """查找目录中的Excel文件：一次scandir遍历，按后缀分类并排除临时文件"""
     directory = Path(directory)
     if not directory.exists():
         return []
     
     excel_files = []
-    for pattern_ext in ["*.xlsx", "*.xls"]:
-        excel_files.extend(directory.glob(pattern_ext))
-        excel_files.extend(directory.glob(f"**/{pattern_ext}"))  # 递归查找
+    stack = [directory]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue  # 目录不可读或已被删除
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif (entry.name.endswith(('.xlsx', '.xls'))
+                      and not entry.name.startswith('~$')  # 排除临时文件
+                      and not entry.name.endswith(TMP_SUFFIX)
+                      and entry.is_file()):
+                    excel_files.append(Path(entry.path))
     
-    return [f for f in excel_files if not f.name.startswith('~$')]  # 排除临时文件
+    return excel_files
 
 def batch_process_excel(input_path, output_dir=None, keep_columns=5, max_workers=None, recursive=False):
     """批量处理Excel文件"""
@@ -127,11 +167,7 @@ def batch_process_excel(input_path, output_dir=None, keep_columns=5, max_workers
     if input_path.is_file():
         files_to_process = [input_path]
     elif input_path.is_dir():
-        if recursive:
-            files_to_process = find_excel_files(input_path)
-        else:
-            files_to_process = [f for f in input_path.glob("*.xlsx") if not f.name.startswith('~$')]
-            files_to_process.extend([f for f in input_path.glob("*.xls") if not f.name.startswith('~$')])
+        files_to_process = find_excel_files(input_path, recursive)
     else:
         print(f"错误：路径 {input_path} 不存在")
         return False
@@ -161,7 +197,7 @@ def batch_process_excel(input_path, output_dir=None, keep_columns=5, max_workers
         # 多文件并行处理
         print(f"启动 {max_workers} 个进程进行并行处理...")
         
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context()) as executor:
             future_to_file = {
                 executor.submit(process_single_excel, file_info): file_info[0] 
                 for file_info in file_info_list
@@ -8,108 +8,123 @@
 import argparse
 import sys
 import time
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from multiprocessing import cpu_count
 from pathlib import Path
 
-import pandas as pd
+from table_io import FORMATS, find_tables, native_io, pool_context, read_columns, read_table_in_ranges, write_table
+
+
+def _failed_results(input_file, ranges, error, original_count=0):
+    """读取失败时，为每个范围生成一条失败记录"""
+    return [{
+        'file': str(input_file),
+        'success': False,
+        'error': error,
+        'range_label': range_label,
+        'original_count': original_count,
+        'filtered_count': 0
+    } for _, _, range_label in ranges]
 
 
 def filter_single_file(file_info):
     """
     处理单个Excel文件的函数，用于并行处理
+    文件只读取一次，依次写出每个范围的过滤结果
     
     Args:
-        file_info: (input_file, output_dir, min_value, max_value, range_label)
+        file_info: (input_file, output_dir, ranges, output_format)
     
     Returns:
-        dict: 处理结果信息
+        list: 每个范围一条处理结果信息
     """
-    input_file, output_dir, min_value, max_value, range_label = file_info
+    input_file, output_dir, ranges, output_format = file_info
     
     try:
-        # 读取Excel文件
-        df = pd.read_excel(input_file)
-        
-        # 检查是否包含总里程列
-        mileage_columns = ['总里程(公里)', '总里程', 'mileage', 'total_mileage']
-        mileage_col = None
-        
-        for col in mileage_columns:
-            if col in df.columns:
-                mileage_col = col
-                break
-        
-        if mileage_col is None:
-            return {
+        # 先只读表头确定里程列
+        columns = read_columns(input_file)
+    except Exception as e:
+        return _failed_results(input_file, ranges, str(e))
+    
+    # 检查是否包含总里程列
+    mileage_columns = ['总里程(公里)', '总里程', 'mileage', 'total_mileage']
+    mileage_col = None
+    
+    for col in mileage_columns:
+        if col in columns:
+            mileage_col = col
+            break
+    
+    if mileage_col is None:
+        return _failed_results(input_file, ranges, f'未找到里程列，可用列: {columns}')
+    
+    try:
+        # 读取Excel/Parquet文件；Parquet（或已缓存）时只读入落在各范围内的行
+        df, total_rows = read_table_in_ranges(input_file, mileage_col,
+                                              [(min_value, max_value) for min_value, max_value, _ in ranges])
+    except Exception as e:
+        return _failed_results(input_file, ranges, str(e))
+    
+    mileage = df[mileage_col].to_numpy()
+    input_path = Path(input_file)
+    results = []
+    
+    for min_value, max_value, range_label in ranges:
+        try:
+            # 过滤数据：直接在numpy数组上比较，避免构造中间的pandas布尔Series
+            filtered_df = df.iloc[(mileage >= min_value) & (mileage <= max_value)]
+            
+            # 生成输出文件名，按范围标签创建子文件夹
+            output_name = f"{input_path.stem}_{range_label}{FORMATS[output_format]}"
+            if output_dir:
+                # 使用指定输出目录，在其下创建范围子文件夹
+                output_path = Path(output_dir) / range_label / output_name
+            else:
+                # 在输入文件同级目录创建范围子文件夹
+                output_path = input_path.parent / range_label / output_name
+            
+            # 确保输出目录存在
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            # 保存过滤后的数据
+            write_table(filtered_df, output_path)
+            
+            results.append({
+                'file': str(input_file),
+                'success': True,
+                'output': str(output_path),
+                'range_label': range_label,
+                'original_count': total_rows,
+                'filtered_count': len(filtered_df),
+                'mileage_column': mileage_col
+            })
+            
+        except Exception as e:
+            results.append({
                 'file': str(input_file),
                 'success': False,
-                'error': f'未找到里程列，可用列: {list(df.columns)}',
+                'error': str(e),
                 'range_label': range_label,
-                'original_count': len(df),
+                'original_count': total_rows,
                 'filtered_count': 0
-            }
-        
-        # 过滤数据
-        filtered_df = df[(df[mileage_col] >= min_value) & 
-                        (df[mileage_col] <= max_value)]
-        
-        # 生成输出文件名，按范围标签创建子文件夹
-        input_path = Path(input_file)
-        if output_dir:
-            # 使用指定输出目录，在其下创建范围子文件夹
-            output_path = Path(output_dir) / range_label / f"{input_path.stem}_{range_label}{input_path.suffix}"
-        else:
-            # 在输入文件同级目录创建范围子文件夹
-            output_path = input_path.parent / range_label / f"{input_path.stem}_{range_label}{input_path.suffix}"
-        
-        # 确保输出目录存在
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 保存过滤后的数据
-        filtered_df.to_excel(output_path, index=False, engine='openpyxl')
-        
-        return {
-            'file': str(input_file),
-            'success': True,
-            'output': str(output_path),
-            'range_label': range_label,
-            'original_count': len(df),
-            'filtered_count': len(filtered_df),
-            'mileage_column': mileage_col
-        }
-        
-    except Exception as e:
-        return {
-            'file': str(input_file),
-            'success': False,
-            'error': str(e),
-            'range_label': range_label,
-            'original_count': 0,
-            'filtered_count': 0
-        }
+            })
+    
+    return results
 
 
-def find_excel_files(directory, recursive=False):
-    """查找目录中的Excel文件"""
-    directory = Path(directory)
-    if not directory.exists():
-        return []
-    
-    excel_files = []
-    patterns = ["*.xlsx", "*.xls"]
-    
-    for pattern in patterns:
-        if recursive:
-            excel_files.extend(directory.glob(f"**/{pattern}"))
+def _print_results(results):
+    """逐条打印单个文件各范围的处理结果"""
+    for result in results:
+        if result['success']:
+            print(f"✓ {Path(result['file']).name} [{result['range_label']}]: "
+                  f"{result['original_count']} → {result['filtered_count']} 条记录")
         else:
-            excel_files.extend(directory.glob(pattern))
-    
-    # 排除临时文件，但保留已处理的文件
-    return [f for f in excel_files if not f.name.startswith('~$')]
+            print(f"✗ {Path(result['file']).name} [{result['range_label']}]: "
+                  f"{result['error']}")
 
 
-def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None, recursive=False):
+def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None, recursive=False,
+                         output_format='xlsx'):
     """
     批量过滤Excel文件中的里程数据
     
@@ -119,6 +134,7 @@ def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None,
         output_dir: 输出目录（可选）
         max_workers: 并行处理的进程数
         recursive: 是否递归处理子目录
+        output_format: 输出格式，xlsx或parquet（中间结果用parquet更快）
     """
     
     input_path = Path(input_path)
@@ -127,13 +143,13 @@ def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None,
     if input_path.is_file():
         files_to_process = [input_path]
     elif input_path.is_dir():
-        files_to_process = find_excel_files(input_path, recursive)
+        files_to_process = find_tables(input_path, recursive)
     else:
         print(f"错误：路径 {input_path} 不存在")
         return False
     
     if not files_to_process:
-        print(f"在 {input_path} 中未找到Excel文件")
+        print(f"在 {input_path} 中未找到Excel/Parquet文件")
         return False
     
     print(f"找到 {len(files_to_process)} 个Excel文件")
@@ -141,15 +157,17 @@ def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None,
     
     # 准备并行处理任务
     if max_workers is None:
-        max_workers = min(cpu_count(), len(files_to_process) * len(ranges))
+        max_workers = min(cpu_count(), len(files_to_process))
     
-    # 为每个文件和每个范围生成任务
-    tasks = []
-    for file_path in files_to_process:
-        for min_val, max_val, label in ranges:
-            tasks.append((file_path, output_dir, min_val, max_val, label))
+    # 每个文件一个任务：文件只读取一次，在任务内按各范围过滤
+    # 按文件大小从大到小提交（LPT），最大的文件最先开始，不会在最后拖慢整体
+    files_by_size = sorted(files_to_process, key=lambda p: p.stat().st_size, reverse=True)
+    tasks = [(file_path, output_dir, ranges, output_format) for file_path in files_by_size]
     
-    print(f"启动 {max_workers} 个进程处理 {len(tasks)} 个任务...")
+    # 读写都由pyarrow完成时用线程池，省去创建进程和序列化结果的开销
+    use_threads = native_io(files_to_process, output_format)
+    worker_kind = "线程" if use_threads else "进程"
+    print(f"启动 {max_workers} 个{worker_kind}处理 {len(tasks)} 个文件...")
     
     # 并行处理
     start_time = time.time()
@@ -157,11 +175,15 @@ def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None,
     
     if len(tasks) == 1:
         # 单任务处理
-        result = filter_single_file(tasks[0])
-        results = [result]
+        results = filter_single_file(tasks[0])
     else:
         # 多任务并行处理
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        if use_threads:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
+        
+        with executor:
             future_to_task = {
                 executor.submit(filter_single_file, task): task 
                 for task in tasks
@@ -170,25 +192,13 @@ def batch_filter_mileage(input_path, ranges, output_dir=None, max_workers=None,
             for future in as_completed(future_to_task):
                 task = future_to_task[future]
                 try:
-                    result = future.result()
-                    results.append(result)
-                    
-                    if result['success']:
-                        print(f"✓ {Path(result['file']).name} [{result['range_label']}]: "
-                              f"{result['original_count']} → {result['filtered_count']} 条记录")
-                    else:
-                        print(f"✗ {Path(result['file']).name} [{result['range_label']}]: "
-                              f"{result['error']}")
-                        
+                    file_results = future.result()
                 except Exception as e:
-                    file_path, _, _, _, range_label = task
-                    print(f"✗ {Path(file_path).name} [{range_label}]: 处理异常 - {e}")
-                    results.append({
-                        'file': str(file_path),
-                        'success': False,
-                        'error': str(e),
-                        'range_label': range_label
-                    })
+                    file_path, _, _, _ = task
+                    file_results = _failed_results(file_path, ranges, f"处理异常 - {e}")
+                
+                results.extend(file_results)
+                _print_results(file_results)
     
     # 统计结果
     end_time = time.time()
@@ -240,6 +250,7 @@ def main():
   python %(prog)s data/ -r 0,20,low 45,55,medium       # 自定义过滤范围
   python %(prog)s data/ -w 8                           # 使用8个进程并行处理
   python %(prog)s data/ --recursive                    # 递归处理子目录
+  python %(prog)s data/ -f parquet                     # 中间结果保存为Parquet
         """
     )
     
@@ -251,6 +262,8 @@ def main():
                        help='并行处理的进程数（默认：自动检测）')
     parser.add_argument('--recursive', action='store_true',
                        help='递归处理子目录')
+    parser.add_argument('-f', '--format', choices=list(FORMATS), default='xlsx',
+                       help='输出格式（默认：xlsx；parquet读写更快，适合作为03的输入）')
     
     args = parser.parse_args()
     
@@ -272,7 +285,8 @@ def main():
         ranges=parsed_ranges,
         output_dir=args.output,
         max_workers=args.workers,
-        recursive=args.recursive
+        recursive=args.recursive,
+        output_format=args.format
     )
     
     sys.exit(0 if success else 1)
@@ -12,14 +12,15 @@
 import argparse
 import sys
 import time
-import random
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from multiprocessing import cpu_count
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
 
+from table_io import FORMATS, find_tables, native_io, pool_context, read_table, write_table
+
 
 def extract_prefix(filename):
     """从文件名提取数字前缀"""
@@ -31,9 +32,9 @@ def find_matched_files(low_dir, medium_dir):
     low_dir = Path(low_dir)
     medium_dir = Path(medium_dir)
     
-    # 获取所有Excel文件
-    low_files = list(low_dir.glob("*.xlsx"))
-    medium_files = list(medium_dir.glob("*.xlsx"))
+    # 获取所有Excel/Parquet文件
+    low_files = find_tables(low_dir)
+    medium_files = find_tables(medium_dir)
     
     # 建立前缀到文件的映射
     low_map = {extract_prefix(f): f for f in low_files}
@@ -55,60 +56,55 @@ def merge_single_pair(task_info):
     处理单个文件对的合并任务
     
     Args:
-        task_info: (prefix, low_file, medium_file, output_dir, random_seed)
+        task_info: (prefix, low_file, medium_file, output_dir, random_seed, output_format)
     
     Returns:
         dict: 处理结果信息
     """
-    prefix, low_file, medium_file, output_dir, random_seed = task_info
+    prefix, low_file, medium_file, output_dir, random_seed, output_format = task_info
     
     try:
-        # 设置随机种子以确保可重现性
-        random.seed(random_seed)
-        np.random.seed(random_seed)
-        
         # 读取数据
-        df_low = pd.read_excel(low_file)
-        df_medium = pd.read_excel(medium_file)
+        df_low = read_table(low_file)
+        df_medium = read_table(medium_file)
         
         low_count = len(df_low)
         medium_count = len(df_medium)
         
         # 数据对齐：随机复制medium数据以匹配low数据量
         if medium_count < low_count:
-            # 计算需要复制的数量
-            needed_copies = low_count - medium_count
-            
-            # 随机复制medium数据
-            # 使用replace=True允许重复采样
-            additional_medium = df_medium.sample(n=needed_copies, replace=True, random_state=random_seed)
+            # 固定种子的独立随机数生成器，确保可重现性
+            rng = np.random.default_rng(random_seed)
             
-            # 合并原始数据和复制数据
-            df_medium_aligned = pd.concat([df_medium, additional_medium], ignore_index=True)
-            
-            # 随机打乱顺序以确保随机化
-            df_medium_aligned = df_medium_aligned.sample(frac=1, random_state=random_seed).reset_index(drop=True)
+            # 原始行各保留一次，再用replace=True的方式随机补足差额，打乱后一次取出
+            needed_copies = low_count - medium_count
+            index = np.concatenate([np.arange(medium_count),
+                                    rng.integers(0, medium_count, size=needed_copies)])
+            rng.shuffle(index)
+            df_medium_aligned = df_medium.iloc[index].reset_index(drop=True)
         else:
-            df_medium_aligned = df_medium.copy()
+            # 无需对齐时直接复用：df_medium之后不再单独使用，下面只替换列名，不必复制
+            df_medium_aligned = df_medium
         
-        # 添加列前缀以区分数据来源
-        df_low_prefixed = df_low.add_prefix('low_')
-        df_medium_prefixed = df_medium_aligned.add_prefix('medium_')
+        # 添加列前缀以区分数据来源：直接替换列名，不像add_prefix那样复制整个DataFrame
+        df_low.columns = [f'low_{col}' for col in df_low.columns]
+        df_medium_aligned.columns = [f'medium_{col}' for col in df_medium_aligned.columns]
         
-        # 横向合并（low在左，medium在右）
-        df_merged = pd.concat([df_low_prefixed, df_medium_prefixed], axis=1)
+        # 横向合并（low在左，medium在右），各列保持原有dtype
+        df_merged = pd.concat([df_low, df_medium_aligned], axis=1)
         
         # 生成输出文件名
+        output_name = f"{prefix}_merged{FORMATS[output_format]}"
         if output_dir:
-            output_path = Path(output_dir) / f"{prefix}_merged.xlsx"
+            output_path = Path(output_dir) / output_name
         else:
-            output_path = Path(low_file).parent.parent / f"{prefix}_merged.xlsx"
+            output_path = Path(low_file).parent.parent / output_name
         
         # 确保输出目录存在
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         # 保存合并结果
-        df_merged.to_excel(output_path, index=False, engine='openpyxl')
+        write_table(df_merged, output_path)
         
         return {
             'prefix': prefix,
@@ -134,7 +130,8 @@ def merge_single_pair(task_info):
         }
 
 
-def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, base_seed=42):
+def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, base_seed=42,
+                      output_format='xlsx'):
     """
     批量合并low和medium文件
     
@@ -144,6 +141,7 @@ def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, ba
         output_dir: 输出目录（可选）
         max_workers: 并行处理的进程数
         base_seed: 基础随机种子
+        output_format: 输出格式，xlsx或parquet（中间结果用parquet更快）
     """
     
     # 找到匹配的文件对
@@ -165,9 +163,12 @@ def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, ba
     tasks = []
     for i, (prefix, low_file, medium_file) in enumerate(file_pairs):
         task_seed = base_seed + i * 1000  # 确保不同任务有不同的种子
-        tasks.append((prefix, low_file, medium_file, output_dir, task_seed))
+        tasks.append((prefix, low_file, medium_file, output_dir, task_seed, output_format))
     
-    print(f"\n启动 {max_workers} 个进程处理 {len(tasks)} 个合并任务...")
+    # 读写都由pyarrow完成时用线程池，省去创建进程和序列化结果的开销
+    use_threads = native_io([f for pair in file_pairs for f in pair[1:]], output_format)
+    worker_kind = "线程" if use_threads else "进程"
+    print(f"\n启动 {max_workers} 个{worker_kind}处理 {len(tasks)} 个合并任务...")
     
     # 并行处理
     start_time = time.time()
@@ -179,7 +180,12 @@ def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, ba
         results = [result]
     else:
         # 多任务并行处理
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        if use_threads:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
+        
+        with executor:
             future_to_task = {
                 executor.submit(merge_single_pair, task): task 
                 for task in tasks
@@ -200,7 +206,7 @@ def batch_merge_files(low_dir, medium_dir, output_dir=None, max_workers=None, ba
                         print(f"✗ {result['prefix']}: {result['error']}")
                         
                 except Exception as e:
-                    prefix, _, _, _, seed = task
+                    prefix, _, _, _, seed, _ = task
                     print(f"✗ {prefix}: 处理异常 - {e}")
                     results.append({
                         'prefix': prefix,
@@ -251,6 +257,7 @@ def main():
   python %(prog)s cleaned/low cleaned/medium -o merged/     # 指定输出目录
   python %(prog)s cleaned/low cleaned/medium -w 4           # 使用4个进程
   python %(prog)s cleaned/low cleaned/medium -s 123         # 指定随机种子
+  python %(prog)s cleaned/low cleaned/medium -f parquet     # 合并结果保存为Parquet
         """
     )
     
@@ -261,6 +268,8 @@ def main():
                        help='并行处理的进程数（默认：自动检测）')
     parser.add_argument('-s', '--seed', type=int, default=42,
                        help='随机种子（默认：42）')
+    parser.add_argument('-f', '--format', choices=list(FORMATS), default='xlsx',
+                       help='输出格式（默认：xlsx；parquet读写更快，适合作为04的输入）')
     
     args = parser.parse_args()
     
@@ -269,7 +278,8 @@ def main():
         medium_dir=args.medium_dir,
         output_dir=args.output,
         max_workers=args.workers,
-        base_seed=args.seed
+        base_seed=args.seed,
+        output_format=args.format
     )
     
     sys.exit(0 if success else 1)
@@ -1,53 +1,57 @@
 #!/usr/bin/env python3
 """
-合并merged目录下的所有xlsx文件为单个文件
+合并merged目录下的所有xlsx/parquet文件为单个文件
 功能：
-1. 自动发现并过滤有效的xlsx文件（排除临时文件）
+1. 自动发现并过滤有效的xlsx/parquet文件（排除临时文件）
 2. 验证列结构一致性
 3. 垂直合并所有数据，只保留单行列名
-4. 支持大文件优化和进度显示
+4. 支持大文件优化和进度显示（xlsx输出边读边写，不在内存中拼接全部数据）
 遵循Unix设计哲学：专注做好一件事
 """
 
 import argparse
+import os
 import sys
 import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
+import psutil
+
+from table_io import (ParquetStreamWriter, XlsxStreamWriter, estimate_rows, find_tables,
+                      is_parquet, read_columns, read_table, write_table)
+
+# 预估合并结果超过可用内存的这个比例时，Parquet输出也改为流式写出
+MEMORY_LIMIT_RATIO = 0.5
 
 
 def find_valid_xlsx_files(directory):
     """
-    查找目录中有效的xlsx文件
+    查找目录中有效的xlsx/parquet文件
     
     Args:
         directory: 目录路径
     
     Returns:
-        list: 有效xlsx文件路径列表
+        list: 有效文件路径列表
     """
-    directory = Path(directory)
-    if not directory.exists():
-        return []
-    
-    # 获取所有xlsx文件，排除临时文件和系统文件
-    xlsx_files = []
-    for file_path in directory.glob("*.xlsx"):
-        # 排除临时文件和隐藏文件
-        if not file_path.name.startswith(('~$', '.', '#')):
-            xlsx_files.append(file_path)
-    
-    return sorted(xlsx_files)
+    # 排除临时文件和隐藏文件
+    return [file_path for file_path in find_tables(directory)
+            if file_path.suffix.lower() != '.xls'
+            and not file_path.name.startswith(('~$', '.', '#'))]
 
 
-def validate_column_consistency(file_paths):
+def validate_column_consistency(file_paths, use_parallel=True):
     """
     验证所有文件的列结构一致性
+    多个文件时并行读取表头，发现不一致或读取出错时取消其余读取
     
     Args:
         file_paths: xlsx文件路径列表
+        use_parallel: 是否并行读取表头
     
     Returns:
         tuple: (是否一致, 统一列名, 错误信息)
@@ -55,21 +59,58 @@ def validate_column_consistency(file_paths):
     if not file_paths:
         return False, None, "没有找到有效文件"
     
-    reference_columns = None
-    
-    for file_path in file_paths:
-        try:
-            # 只读取第一行获取列名，提高性能
-            df_sample = pd.read_excel(file_path, nrows=0)
-            current_columns = list(df_sample.columns)
+    if not use_parallel or len(file_paths) == 1:
+        reference_columns = None
+        for file_path in file_paths:
+            try:
+                # 只读取表头获取列名，提高性能
+                current_columns = read_columns(file_path)
+            except Exception as e:
+                return False, None, f"读取文件 {file_path.name} 时出错: {e}"
             
             if reference_columns is None:
                 reference_columns = current_columns
             elif current_columns != reference_columns:
                 return False, None, f"文件 {file_path.name} 的列结构与其他文件不一致"
-                
-        except Exception as e:
-            return False, None, f"读取文件 {file_path.name} 时出错: {e}"
+        
+        return True, reference_columns, None
+    
+    with ThreadPoolExecutor(max_workers=min(4, len(file_paths))) as executor:
+        future_to_file = {
+            executor.submit(read_columns, file_path): file_path
+            for file_path in file_paths
+        }
+        reference_file = file_paths[0]
+        reference_columns = None
+        pending = []
+        error_msg = None
+        
+        for future in as_completed(future_to_file):
+            file_path = future_to_file[future]
+            try:
+                current_columns = future.result()
+            except Exception as e:
+                error_msg = f"读取文件 {file_path.name} 时出错: {e}"
+                break
+            
+            if file_path == reference_file:
+                reference_columns = current_columns
+                # 参考表头到达前完成的文件在此补做比较
+                mismatched = [p for p, cols in pending if cols != reference_columns]
+                if mismatched:
+                    error_msg = f"文件 {mismatched[0].name} 的列结构与其他文件不一致"
+                    break
+            elif reference_columns is None:
+                pending.append((file_path, current_columns))
+            elif current_columns != reference_columns:
+                error_msg = f"文件 {file_path.name} 的列结构与其他文件不一致"
+                break
+        
+        if error_msg:
+            # 取消尚未开始的表头读取
+            for future in future_to_file:
+                future.cancel()
+            return False, None, error_msg
     
     return True, reference_columns, None
 
@@ -85,12 +126,47 @@ def read_file_data(file_path):
         tuple: (文件名, DataFrame对象, 错误信息)
     """
     try:
-        df = pd.read_excel(file_path)
+        df = read_table(file_path)
         return file_path.name, df, None
     except Exception as e:
         return file_path.name, None, str(e)
 
 
+def iter_file_data(file_paths, use_parallel=True, max_workers=4):
+    """
+    按文件名顺序逐个产出文件数据
+    并行时最多同时读取max_workers个文件，避免读取快于写出时所有数据都堆在内存里
+    
+    Args:
+        file_paths: 已排序的文件路径列表
+        use_parallel: 是否使用并行读取
+        max_workers: 并行读取的线程数
+    
+    Yields:
+        tuple: (文件名, DataFrame对象, 错误信息)
+    """
+    if not use_parallel or len(file_paths) == 1:
+        for file_path in file_paths:
+            yield read_file_data(file_path)
+        return
+    
+    # 不用executor.map：它虽然同样按输入顺序返回，但会一次性提交全部文件，
+    # 写出跟不上时所有已读完的DataFrame都会留在内存里
+    max_workers = min(max_workers, len(file_paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        paths = iter(file_paths)
+        for file_path in islice(paths, max_workers):
+            pending.append(executor.submit(read_file_data, file_path))
+        
+        while pending:
+            result = pending.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(executor.submit(read_file_data, next_path))
+            yield result
+
+
 def concat_xlsx_files(input_dir, output_file=None, use_parallel=True):
     """
     合并目录中的所有xlsx文件
@@ -119,7 +195,7 @@ def concat_xlsx_files(input_dir, output_file=None, use_parallel=True):
     
     # 2. 验证列结构一致性
     print(f"\n验证列结构一致性...")
-    is_consistent, columns, error_msg = validate_column_consistency(xlsx_files)
+    is_consistent, columns, error_msg = validate_column_consistency(xlsx_files, use_parallel)
     
     if not is_consistent:
         print(f"✗ 列结构验证失败: {error_msg}")
@@ -128,115 +204,106 @@ def concat_xlsx_files(input_dir, output_file=None, use_parallel=True):
     print(f"✓ 列结构一致，共 {len(columns)} 列")
     print(f"列名: {columns}")
     
-    # 3. 读取并合并数据
-    print(f"\n开始读取数据...")
-    start_time = time.time()
+    # 3. 确定输出路径
+    if output_file is None:
+        output_file = Path(input_dir) / "merged_all.xlsx"
+    else:
+        output_file = Path(output_file)
     
-    dataframes = []
+    # 确保输出目录存在
+    output_file.parent.mkdir(parents=True, exist_ok=True)
     
+    # 4. 逐个读取并写出
+    # xlsx输出：每读完一个文件就追加到流式写出的工作表，内存中最多只有几个文件的数据
+    # parquet输出：读取全部后用pd.concat合并再写出；预估内存不足时同样流式写出
+    stream = True
+    if is_parquet(output_file):
+        estimated_rows = sum(estimate_rows(file_path) for file_path in xlsx_files)
+        estimated_bytes = estimated_rows * len(columns) * 8
+        available = psutil.virtual_memory().available
+        stream = estimated_bytes > MEMORY_LIMIT_RATIO * available
+        if stream:
+            print(f"\n预估数据约 {estimated_bytes / 1024 / 1024:.0f}MB，超过可用内存的"
+                  f"{MEMORY_LIMIT_RATIO:.0%}，改为流式写出")
+    
+    print(f"\n开始读取数据，合并结果保存到: {output_file}")
     if use_parallel and len(xlsx_files) > 1:
-        # 并行读取多个文件
         print(f"使用并行方式读取 {len(xlsx_files)} 个文件...")
+    start_time = time.time()
+    
+    tmp_path = output_file.with_name(output_file.name + '.tmp')
+    writer = None
+    dataframes = []
+    total_rows = 0
+    
+    try:
+        if stream and is_parquet(output_file):
+            writer = ParquetStreamWriter(tmp_path)
+        elif stream:
+            writer = XlsxStreamWriter(tmp_path, columns)
         
-        with ThreadPoolExecutor(max_workers=min(4, len(xlsx_files))) as executor:
-            future_to_file = {
-                executor.submit(read_file_data, file_path): file_path 
-                for file_path in xlsx_files
-            }
-            
-            for future in as_completed(future_to_file):
-                file_path = future_to_file[future]
-                filename, df, error = future.result()
-                
-                if error:
-                    print(f"✗ {filename}: 读取失败 - {error}")
-                    return False
-                else:
-                    dataframes.append((filename, df))
-                    print(f"✓ {filename}: {df.shape[0]} 行")
-    else:
-        # 串行读取
-        for file_path in xlsx_files:
-            filename, df, error = read_file_data(file_path)
-            
+        for filename, df, error in iter_file_data(xlsx_files, use_parallel):
             if error:
                 print(f"✗ {filename}: 读取失败 - {error}")
                 return False
+            
+            print(f"✓ {filename}: {df.shape[0]} 行")
+            total_rows += len(df)
+            if writer is not None:
+                writer.append(df)
             else:
-                dataframes.append((filename, df))
-                print(f"✓ {filename}: {df.shape[0]} 行")
-    
-    # 按文件名排序确保一致性
-    dataframes.sort(key=lambda x: x[0])
-    
-    # 4. 合并数据
-    print(f"\n合并数据...")
-    try:
-        # 提取DataFrame对象
-        df_list = [df for _, df in dataframes]
-        
-        # 使用pd.concat垂直合并，ignore_index=True重置索引
-        merged_df = pd.concat(df_list, ignore_index=True, sort=False)
+                dataframes.append(df)
         
-        read_time = time.time() - start_time
-        print(f"✓ 数据合并完成")
-        print(f"最终形状: {merged_df.shape}")
-        print(f"读取时间: {read_time:.2f}秒")
+        if writer is not None:
+            writer.close()
+            # 全部写完才替换，中途失败不会留下不完整的输出文件
+            os.replace(tmp_path, output_file)
+        else:
+            # 使用pd.concat垂直合并，ignore_index=True重置索引
+            merged_df = pd.concat(dataframes, ignore_index=True, sort=False)
+            write_table(merged_df, output_file)
         
     except Exception as e:
-        print(f"✗ 数据合并失败: {e}")
+        print(f"✗ 合并保存失败: {e}")
         return False
     
-    # 5. 保存结果
-    if output_file is None:
-        output_file = Path(input_dir) / "merged_all.xlsx"
-    else:
-        output_file = Path(output_file)
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
     
-    # 确保输出目录存在
-    output_file.parent.mkdir(parents=True, exist_ok=True)
+    print(f"✓ 文件保存成功")
     
-    print(f"\n保存合并结果到: {output_file}")
-    save_start = time.time()
+    # 统计信息
+    total_time = time.time() - start_time
+    print(f"\n=== 合并统计 ===")
+    print(f"输入文件数: {len(xlsx_files)}")
+    print(f"总行数: {total_rows}")
+    print(f"总列数: {len(columns)}")
+    print(f"输出文件: {output_file.name}")
+    print(f"总耗时: {total_time:.2f}秒")
     
-    try:
-        merged_df.to_excel(output_file, index=False, engine='openpyxl')
-        save_time = time.time() - save_start
-        
-        print(f"✓ 文件保存成功")
-        print(f"保存时间: {save_time:.2f}秒")
-        
-        # 统计信息
-        total_time = time.time() - start_time
-        print(f"\n=== 合并统计 ===")
-        print(f"输入文件数: {len(xlsx_files)}")
-        print(f"总行数: {merged_df.shape[0]}")
-        print(f"总列数: {merged_df.shape[1]}")
-        print(f"输出文件: {output_file.name}")
-        print(f"总耗时: {total_time:.2f}秒")
-        
-        return True
-        
-    except Exception as e:
-        print(f"✗ 文件保存失败: {e}")
-        return False
+    return True
 
 
 def main():
     """主函数，支持命令行参数"""
     parser = argparse.ArgumentParser(
-        description="合并目录中的所有xlsx文件为单个文件",
+        description="合并目录中的所有xlsx/parquet文件为单个文件",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用示例:
   python %(prog)s merged/                           # 合并merged目录下所有xlsx文件
   python %(prog)s merged/ -o final_merged.xlsx     # 指定输出文件名
+  python %(prog)s merged/ -o merged_all.parquet    # 输出为Parquet
   python %(prog)s merged/ --no-parallel            # 禁用并行读取
         """
     )
     
-    parser.add_argument('input_dir', help='包含xlsx文件的输入目录')
-    parser.add_argument('-o', '--output', help='输出文件路径（默认：输入目录/merged_all.xlsx）')
+    parser.add_argument('input_dir', help='包含xlsx/parquet文件的输入目录')
+    parser.add_argument('-o', '--output',
+                       help='输出文件路径，按后缀决定格式（默认：输入目录/merged_all.xlsx）')
     parser.add_argument('--no-parallel', action='store_true',
                        help='禁用并行读取（用于调试或低内存环境）')
     
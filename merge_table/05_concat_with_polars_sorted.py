@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
 使用Polars优化的Excel文件合并工具 - 智能日期排序版本
-采用混合方案：pandas读取Excel + Polars高性能合并 + pandas输出Excel
+采用混合方案：pandas读取Excel + Polars高性能合并 + 流式输出Excel（或Parquet）
 功能：
-1. 智能文件读取策略（根据文件大小选择最优读取方式）
+1. 多进程读取Excel（优先calamine/fastexcel，所有文件使用同一种读取方式）
 2. pandas到Polars的高效转换
 3. 批量处理支持（避免内存溢出）
 4. 内存优化和性能监控
@@ -13,14 +13,19 @@
 """
 
 import argparse
+import calendar
 import gc
+import io
+import multiprocessing as mp
 import os
 import re
 import sys
 import time
-from datetime import datetime
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Optional
 import warnings
 
@@ -29,16 +34,31 @@ import polars as pl
 import psutil
 from tqdm import tqdm
 
+from table_io import FORMATS, HAS_CALAMINE, write_polars
+
+# pandas的calamine引擎（Rust实现）需要python-calamine和pandas>=2.2，见table_io
+EXCEL_READ_ENGINE = 'calamine' if HAS_CALAMINE else 'openpyxl'
+
+try:
+    import fastexcel  # noqa: F401  pl.read_excel的calamine引擎依赖
+    HAS_FASTEXCEL = True
+except ImportError:
+    HAS_FASTEXCEL = False
+
 # 忽略特定警告
 warnings.filterwarnings('ignore', category=UserWarning)
 
-# 预编译正则表达式（性能优化）
-PATTERN_WITH_YEAR = re.compile(r'^(\d{4})_(\d{2})(\d{2})_')
-PATTERN_WITHOUT_YEAR = re.compile(r'^(\d{2})(\d{2})_')
+# 预编译正则表达式（性能优化）；re.ASCII让\d只匹配0-9，无需查Unicode数字表
+PATTERN_WITH_YEAR = re.compile(r'^(\d{4})_(\d{2})(\d{2})_', re.ASCII)
+PATTERN_WITHOUT_YEAR = re.compile(r'^(\d{2})(\d{2})_', re.ASCII)
 
 
 class MemoryMonitor:
-    """内存使用监控器"""
+    """
+    内存使用监控器
+    只在阶段之间采样（启动、读取完成、保存完成），不在逐文件读取的循环中调用；
+    显示的是当前RSS，因此不用只能给出峰值的resource.getrusage
+    """
     
     def __init__(self, limit_percent=80):
         self.limit_percent = limit_percent
@@ -68,11 +88,6 @@ class MemoryMonitor:
         }
 
 
-def get_file_size_mb(file_path: Path) -> float:
-    """获取文件大小（MB）"""
-    return file_path.stat().st_size / 1024 / 1024
-
-
 def extract_date_from_filename(file_path: Path) -> Tuple[int, int, int, str]:
     """
     智能提取文件名中的日期信息
@@ -84,35 +99,35 @@ def extract_date_from_filename(file_path: Path) -> Tuple[int, int, int, str]:
     Returns:
         tuple: (年, 月, 日, 文件名) 用于排序
     """
-    filename = file_path.stem
+    return _parse_date_from_stem(file_path.stem)[:3] + (file_path.name,)
+
+
+@lru_cache(maxsize=8192)
+def _parse_date_from_stem(filename: str) -> Tuple[int, int, int, str]:
+    """
+    解析文件名（不含后缀）中的日期
     
+    Returns:
+        tuple: (年, 月, 日, 格式)，格式为with_year/without_year/failed，失败时日期为(0, 0, 0)
+    """
     # 格式1: YYYY_MMDD_* (优先匹配)
     match = PATTERN_WITH_YEAR.match(filename)
     if match:
         year, month, day = map(int, match.groups())
-        # 快速有效性检查
-        if 1 <= month <= 12 and 1 <= day <= 31 and 1900 <= year <= 2100:
-            try:
-                # 严格日期验证（处理如0230这种无效日期）
-                datetime(year, month, day)
-                return (year, month, day, file_path.name)
-            except ValueError:
-                pass
+        # 严格日期验证（处理如0230这种无效日期），按当月天数判断，无需构造datetime
+        if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]:
+            return (year, month, day, 'with_year')
     
     # 格式2: MMDD_*
     match = PATTERN_WITHOUT_YEAR.match(filename)
     if match:
         month, day = map(int, match.groups())
-        if 1 <= month <= 12 and 1 <= day <= 31:
-            try:
-                # 使用默认年份2024
-                datetime(2024, month, day)
-                return (2024, month, day, file_path.name)
-            except ValueError:
-                pass
+        # 使用默认年份2024
+        if 1 <= month <= 12 and 1 <= day <= calendar.monthrange(2024, month)[1]:
+            return (2024, month, day, 'without_year')
     
     # 解析失败：使用最小值确保排在最前面，便于调试
-    return (0, 0, 0, file_path.name)
+    return (0, 0, 0, 'failed')
 
 
 def find_valid_xlsx_files(directory: str) -> List[Path]:
@@ -135,32 +150,30 @@ def find_valid_xlsx_files(directory: str) -> List[Path]:
         return []
     
     # 获取所有xlsx文件，排除临时文件和系统文件
-    xlsx_files = []
-    for file_path in directory.glob("*.xlsx"):
-        if not file_path.name.startswith(('~$', '.', '#')):
-            xlsx_files.append(file_path)
+    # scandir一次读出目录项，按名称和目录项类型过滤，无需逐个stat
+    with os.scandir(directory) as entries:
+        xlsx_files = [
+            Path(entry.path) for entry in entries
+            if entry.name.endswith('.xlsx')
+            and not entry.name.startswith(('~$', '.', '#'))
+            and entry.is_file()
+        ]
     
     if not xlsx_files:
         return []
     
     print(f"🔍 智能日期排序：分析 {len(xlsx_files)} 个文件...")
     
-    # 提取所有文件的日期信息
+    # 提取所有文件的日期信息，解析时一并得到文件名格式用于统计
     files_with_dates = []
-    parse_stats = {'with_year': 0, 'without_year': 0, 'failed': 0}
+    parse_stats = Counter()
     year_range = set()
     
     for file_path in xlsx_files:
-        year, month, day, filename = extract_date_from_filename(file_path)
+        year, month, day, name_format = _parse_date_from_stem(file_path.stem)
         files_with_dates.append((year, month, day, file_path))
-        
-        # 统计解析结果
-        if year == 0:
-            parse_stats['failed'] += 1
-        elif year == 2024 and PATTERN_WITHOUT_YEAR.match(file_path.stem):
-            parse_stats['without_year'] += 1
-        else:
-            parse_stats['with_year'] += 1
+        parse_stats[name_format] += 1
+        if name_format == 'with_year':
             year_range.add(year)
     
     # 显示解析统计
@@ -173,10 +186,10 @@ def find_valid_xlsx_files(directory: str) -> List[Path]:
         print(f"  ⚠ 解析失败: {parse_stats['failed']} 个 (将放在最前面)")
     
     # 按日期排序：(年, 月, 日) 元组自然排序
-    sorted_files_with_dates = sorted(files_with_dates, key=lambda x: (x[0], x[1], x[2]))
+    files_with_dates.sort(key=itemgetter(0, 1, 2))
     
     # 提取排序后的文件路径
-    sorted_files = [item[3] for item in sorted_files_with_dates]
+    sorted_files = [item[3] for item in files_with_dates]
     
     # 显示排序结果示例
     if len(sorted_files) <= 10:
@@ -189,64 +202,45 @@ def find_valid_xlsx_files(directory: str) -> List[Path]:
     return sorted_files
 
 
-def validate_column_consistency(file_paths: List[Path]) -> Tuple[bool, Optional[List[str]], Optional[str]]:
+def encode_low_cardinality(df: pl.DataFrame) -> pl.DataFrame:
     """
-    验证所有文件的列结构一致性
-    
-    Args:
-        file_paths: xlsx文件路径列表
-    
-    Returns:
-        tuple: (是否一致, 统一列名, 错误信息)
+    重复值很多的字符串列（去重后不足行数的1/10，如车牌号）转为Categorical字典编码
+    每行只存整数编码，回传主进程和合并时处理的数据量大幅减少
     """
-    if not file_paths:
-        return False, None, "没有找到有效文件"
-    
-    reference_columns = None
-    
-    for file_path in file_paths:
-        try:
-            # 只读取第一行获取列名，提高性能
-            df_sample = pd.read_excel(file_path, nrows=0)
-            current_columns = list(df_sample.columns)
-            
-            if reference_columns is None:
-                reference_columns = current_columns
-            elif current_columns != reference_columns:
-                return False, None, f"文件 {file_path.name} 的列结构与其他文件不一致"
-                
-        except Exception as e:
-            return False, None, f"读取文件 {file_path.name} 时出错: {e}"
-    
-    return True, reference_columns, None
+    threshold = df.height // 10
+    columns = [name for name, dtype in df.schema.items()
+               if dtype == pl.Utf8 and df[name].n_unique() < threshold]
+    if not columns:
+        return df
+    return df.with_columns([pl.col(name).cast(pl.Categorical) for name in columns])
 
 
-def read_excel_optimized(file_path: Path, file_size_mb: float) -> Tuple[str, Optional[pl.DataFrame], Optional[str]]:
+def read_excel_optimized(file_path: Path) -> Tuple[str, Optional[pl.DataFrame], Optional[str]]:
     """
     优化的Excel读取，立即转换为Polars DataFrame
     
     Args:
         file_path: 文件路径
-        file_size_mb: 文件大小（MB）
     
     Returns:
         tuple: (文件名, Polars DataFrame, 错误信息)
     """
     try:
-        # 根据文件大小选择读取策略
-        if file_size_mb < 10:
-            # 小文件：直接pandas读取
-            df_pandas = pd.read_excel(file_path, engine='openpyxl')
-        else:
-            # 大文件：使用read_only模式
-            df_pandas = pd.read_excel(file_path, engine='openpyxl')
+        if HAS_FASTEXCEL:
+            # 在Rust中直接构造Arrow列，不经过pandas中转；
+            # 保留空行空列并按整列推断类型，与pandas读取的结构保持一致
+            df_polars = pl.read_excel(file_path, engine='calamine', infer_schema_length=None,
+                                      drop_empty_rows=False, drop_empty_cols=False,
+                                      raise_if_empty=False)
+            return file_path.name, df_polars, None
         
-        # 立即转换为Polars DataFrame
-        df_polars = pl.from_pandas(df_pandas)
+        # calamine用Rust解析XML，比纯Python的openpyxl快数倍；未安装时退回openpyxl
+        # （原先按文件大小区分的两个分支读取方式完全相同，已合并）
+        df_pandas = pd.read_excel(file_path, engine=EXCEL_READ_ENGINE)
         
-        # 释放pandas DataFrame内存
+        # 立即转换为Polars DataFrame；pandas对象靠引用计数即时释放，无需每个文件都gc.collect()
+        df_polars = pl.from_pandas(df_pandas)
         del df_pandas
-        gc.collect()
         
         return file_path.name, df_polars, None
         
@@ -254,6 +248,28 @@ def read_excel_optimized(file_path: Path, file_size_mb: float) -> Tuple[str, Opt
         return file_path.name, None, str(e)
 
 
+def read_excel_to_ipc(file_path: Path) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """
+    子进程入口：读取Excel并序列化为Arrow IPC字节，主进程用pl.read_ipc还原
+    
+    Returns:
+        tuple: (文件名, IPC字节, 错误信息)
+    """
+    filename, df, error = read_excel_optimized(file_path)
+    if error:
+        return filename, None, error
+    
+    df = encode_low_cardinality(df)
+    buf = io.BytesIO()
+    df.write_ipc(buf)
+    return filename, buf.getvalue(), None
+
+
+def _pool_context():
+    """Polars的线程池在fork后可能死锁，子进程统一用spawn启动"""
+    return mp.get_context('spawn')
+
+
 def batch_process_files(
     file_paths: List[Path], 
     batch_size: int = 50,
@@ -262,60 +278,68 @@ def batch_process_files(
 ) -> Tuple[List[pl.DataFrame], int]:
     """
     批量处理文件，避免内存溢出
+    读取的同时检查列结构一致性，无需单独再解析一遍表头
     
     Args:
         file_paths: 文件路径列表
         batch_size: 每批处理的文件数
-        max_workers: 最大工作线程数
+        max_workers: 最大工作进程数
         progress_bar: 进度条对象
     
     Returns:
         tuple: (Polars DataFrame列表, 总行数)
     """
     if max_workers is None:
-        max_workers = min(int(os.cpu_count() * 0.8), 4)
+        # Excel解析受GIL限制，改用进程池后可以用满所有CPU
+        max_workers = os.cpu_count() or 1
     
     all_dataframes = []
     total_rows = 0
+    reference_columns = None
     
-    # 分批处理
-    for i in range(0, len(file_paths), batch_size):
-        batch_files = file_paths[i:i + batch_size]
-        batch_dfs = []
-        
-        # 获取文件大小信息
-        file_sizes = [(fp, get_file_size_mb(fp)) for fp in batch_files]
-        
-        # 并行读取当前批次
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {
-                executor.submit(read_excel_optimized, fp, size): fp 
-                for fp, size in file_sizes
-            }
+    # 进程池在各批次间复用，避免每批重新启动子进程
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_pool_context()) as executor:
+        # 分批处理
+        for i in range(0, len(file_paths), batch_size):
+            batch_files = file_paths[i:i + batch_size]
+            batch_dfs = []
+            
+            # 并行读取当前批次（读取方式与文件大小无关，不再逐个stat）
+            futures = [executor.submit(read_excel_to_ipc, fp) for fp in batch_files]
             
-            for future in as_completed(future_to_file):
-                filename, df, error = future.result()
+            # 按提交顺序取结果，保证批内数据仍按文件日期排列
+            for future in futures:
+                filename, data, error = future.result()
                 
                 if error:
                     print(f"\n✗ {filename}: 读取失败 - {error}")
                     raise Exception(f"文件读取失败: {filename}")
                 else:
+                    df = pl.read_ipc(io.BytesIO(data))
+                    del data
+                    
+                    # 列名不一致直接中止：diagonal方式的concat会把不同结构的文件补空值后静默合并
+                    if reference_columns is None:
+                        reference_columns = df.columns
+                    elif df.columns != reference_columns:
+                        raise Exception(f"文件 {filename} 的列结构与其他文件不一致")
+                    
                     batch_dfs.append(df)
                     rows = df.shape[0]
                     total_rows += rows
                     if progress_bar:
                         progress_bar.update(1)
                         progress_bar.set_postfix({'rows': total_rows})
-        
-        # 合并当前批次
-        if batch_dfs:
-            # 使用Polars的高效concat
-            batch_merged = pl.concat(batch_dfs, rechunk=True)
-            all_dataframes.append(batch_merged)
             
-            # 释放批次内的DataFrame
-            del batch_dfs
-            gc.collect()
+            # 合并当前批次
+            if batch_dfs:
+                # 只拼接chunk列表，不复制数据；整表写出时按块读取，无需连续内存
+                # 各文件独立决定是否字典编码，同一列可能一边是Categorical一边是字符串，用relaxed统一为字符串
+                batch_merged = pl.concat(batch_dfs, how='vertical_relaxed', rechunk=False)
+                all_dataframes.append(batch_merged)
+                
+                # 释放批次内的DataFrame；Arrow缓冲区随引用计数归零立即释放，无需gc.collect()
+                del batch_dfs
     
     return all_dataframes, total_rows
 
@@ -325,7 +349,8 @@ def merge_with_polars(
     output_file: Optional[str] = None,
     batch_size: int = 50,
     max_workers: Optional[int] = None,
-    memory_limit: int = 80
+    memory_limit: int = 80,
+    output_format: str = 'xlsx'
 ) -> bool:
     """
     使用Polars优化的文件合并主函数
@@ -334,8 +359,9 @@ def merge_with_polars(
         input_dir: 输入目录路径
         output_file: 输出文件路径（可选）
         batch_size: 批处理大小
-        max_workers: 最大工作线程数
+        max_workers: 最大工作进程数
         memory_limit: 内存使用限制百分比
+        output_format: 未指定输出文件时的输出格式，xlsx或parquet
     
     Returns:
         bool: 是否成功
@@ -357,17 +383,7 @@ def merge_with_polars(
     print(f"内存限制: {memory_limit}%")
     print(f"批处理大小: {batch_size} 文件/批")
     
-    # 2. 验证列结构一致性
-    print(f"\n验证列结构一致性...")
-    is_consistent, columns, error_msg = validate_column_consistency(xlsx_files)
-    
-    if not is_consistent:
-        print(f"✗ 列结构验证失败: {error_msg}")
-        return False
-    
-    print(f"✓ 列结构一致，共 {len(columns)} 列")
-    
-    # 3. 批量读取和处理数据
+    # 2. 批量读取和处理数据（读取时同步验证列结构一致性）
     print(f"\n开始批量处理数据...")
     start_time = time.time()
     
@@ -385,16 +401,18 @@ def merge_with_polars(
         mem_info = memory_monitor.get_memory_info()
         print(f"\n内存使用: {mem_info['current_mb']:.1f}MB (已用: {mem_info['used_mb']:.1f}MB, {mem_info['percent']:.1f}%)")
         
-        # 4. 最终合并所有批次
+        n_columns = batch_dataframes[0].width
+        print(f"✓ 列结构一致，共 {n_columns} 列")
+        
+        # 3. 最终合并所有批次
         print(f"\n合并所有批次数据...")
         if len(batch_dataframes) > 1:
-            final_df = pl.concat(batch_dataframes, rechunk=True)
+            final_df = pl.concat(batch_dataframes, how='vertical_relaxed', rechunk=False)
         else:
             final_df = batch_dataframes[0]
         
         # 释放中间结果
         del batch_dataframes
-        gc.collect()
         
         read_time = time.time() - start_time
         print(f"✓ 数据合并完成 (已按文件日期顺序排列)")
@@ -405,9 +423,9 @@ def merge_with_polars(
         print(f"✗ 数据处理失败: {e}")
         return False
     
-    # 5. 保存结果
+    # 4. 保存结果
     if output_file is None:
-        output_file = Path(input_dir) / "merged_all_polars_sorted.xlsx"
+        output_file = Path(input_dir) / f"merged_all_polars_sorted{FORMATS[output_format]}"
     else:
         output_file = Path(output_file)
     
@@ -418,13 +436,10 @@ def merge_with_polars(
     save_start = time.time()
     
     try:
-        # 转换回pandas并保存
-        # 注意：对于超大文件，这一步可能是瓶颈
-        df_pandas = final_df.to_pandas()
-        df_pandas.to_excel(output_file, index=False, engine='openpyxl')
+        # 按输出后缀直接从Polars写出，不再整体转换为pandas（避免内存翻倍）
+        write_polars(final_df, output_file)
         
-        # 释放内存
-        del df_pandas
+        # 释放内存：整个流程只在最后做一次完整回收
         del final_df
         gc.collect()
         
@@ -438,7 +453,7 @@ def merge_with_polars(
         print(f"\n=== 合并统计 ===")
         print(f"输入文件数: {len(xlsx_files)}")
         print(f"总行数: {total_rows}")
-        print(f"总列数: {len(columns)}")
+        print(f"总列数: {n_columns}")
         print(f"输出文件: {output_file.name}")
         print(f"总耗时: {total_time:.2f}秒")
         print(f"平均处理速度: {len(xlsx_files)/total_time:.1f} 文件/秒")
@@ -470,19 +485,23 @@ def main():
   python %(prog)s merged/                               # 合并merged目录下所有xlsx文件
   python %(prog)s merged/ -o final_merged.xlsx         # 指定输出文件名
   python %(prog)s merged/ --batch-size 100             # 设置批处理大小
-  python %(prog)s merged/ --max-workers 8              # 设置最大工作线程数
+  python %(prog)s merged/ --max-workers 8              # 设置最大工作进程数
   python %(prog)s merged/ --memory-limit 90            # 设置内存使用限制
+  python %(prog)s merged/ -f parquet                   # 输出为Parquet
         """
     )
     
     parser.add_argument('input_dir', help='包含xlsx文件的输入目录')
-    parser.add_argument('-o', '--output', help='输出文件路径（默认：输入目录/merged_all_polars_sorted.xlsx）')
+    parser.add_argument('-o', '--output',
+                       help='输出文件路径，按后缀决定格式（默认：输入目录/merged_all_polars_sorted.xlsx）')
     parser.add_argument('--batch-size', type=int, default=50,
                        help='批处理大小，即每批处理的文件数（默认：50）')
     parser.add_argument('--max-workers', type=int,
-                       help='最大工作线程数（默认：CPU核心数*0.8）')
+                       help='最大工作进程数（默认：CPU核心数）')
     parser.add_argument('--memory-limit', type=int, default=80,
                        help='内存使用限制百分比（默认：80）')
+    parser.add_argument('-f', '--format', choices=list(FORMATS), default='xlsx',
+                       help='未指定-o时的输出格式（默认：xlsx）')
     
     args = parser.parse_args()
     
@@ -491,7 +510,8 @@ def main():
         output_file=args.output,
         batch_size=args.batch_size,
         max_workers=args.max_workers,
-        memory_limit=args.memory_limit
+        memory_limit=args.memory_limit,
+        output_format=args.format
     )
     
     sys.exit(0 if success else 1)
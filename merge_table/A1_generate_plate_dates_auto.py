@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
 import re
 from glob import glob
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv  # 原生多线程CSV写出，比pandas逐行格式化快一个数量级
+except ImportError:
+    pacsv = None
+
 def generate_plate_dates_auto():
     """
     自动识别所有from_yyyy_mm_dd.csv格式的文件，
@@ -43,7 +50,8 @@ def generate_plate_dates_auto():
     # 步骤2：读取每个文件的车牌号并生成日期记录
     print("\n步骤2：读取每个文件的车牌号并生成日期记录...\n")
     
-    all_records = []
+    all_dfs = []
+    date_strs_cache = {}  # 起始日期 -> 格式化后的日期数组，同一起始日期只格式化一次并推断一次类型
     total_plates = 0
     
     # 按文件名排序处理，确保结果的一致性
@@ -58,11 +66,12 @@ def generate_plate_dates_auto():
         try:
             df = pd.read_csv(file_path)
             # 获取车牌号（第一列，跳过表头）
-            license_plates = df.iloc[:, 0].dropna().tolist()
+            plates = df.iloc[:, 0].dropna()
             
             # 如果第一个元素是"车牌号"（表头），则移除
-            if license_plates and license_plates[0] == '车牌号':
-                license_plates = license_plates[1:]
+            if len(plates) and plates.iloc[0] == '车牌号':
+                plates = plates.iloc[1:]
+            license_plates = plates.tolist()
             
             print(f"车牌数量：{len(license_plates)}")
             
@@ -72,15 +81,19 @@ def generate_plate_dates_auto():
             print(f"车牌号列表：{', '.join(license_plates[:5])}{'...' if len(license_plates) > 5 else ''}")
             print(f"预计生成记录数：{len(license_plates)} × {len(date_range)} = {len(license_plates) * len(date_range)}")
             
-            # 为每个车牌号生成记录
-            for plate in license_plates:
-                for date in date_range:
-                    # 格式化日期为 YYYY/M/D（无前导零）
-                    formatted_date = f"{date.year}/{date.month}/{date.day}"
-                    all_records.append({
-                        '车号': plate,
-                        '日期': formatted_date
-                    })
+            # 格式化日期为 YYYY/M/D（无前导零）
+            date_strs = date_strs_cache.get(start_date)
+            if date_strs is None:
+                date_strs = pd.array([f"{date.year}/{date.month}/{date.day}" for date in date_range])
+                date_strs_cache[start_date] = date_strs
+            
+            # 车牌号 × 日期的笛卡尔积：每个车牌重复D次，日期序列整体平铺P次
+            # 按位置take已有类型的数组，不再对P×D行的object数组重新推断类型
+            n_plates, n_days = len(plates), len(date_strs)
+            all_dfs.append(pd.DataFrame({
+                '车号': plates.array.take(np.repeat(np.arange(n_plates), n_days)),
+                '日期': date_strs.take(np.tile(np.arange(n_days), n_plates))
+            }))
             
             total_plates += len(license_plates)
             
@@ -91,7 +104,11 @@ def generate_plate_dates_auto():
     
     # 步骤3：创建DataFrame
     print(f"\n步骤3：创建DataFrame...")
-    result_df = pd.DataFrame(all_records)
+    if all_dfs:
+        result_df = pd.concat(all_dfs, ignore_index=True)
+    else:
+        result_df = pd.DataFrame(columns=['车号', '日期'])
+    del all_dfs
     print(f"总记录数：{len(result_df)}")
     print(f"总车牌数：{total_plates}")
     
@@ -103,7 +120,11 @@ def generate_plate_dates_auto():
     # 步骤5：保存文件
     print("\n步骤5：保存到plate_dates.csv...")
     output_path = '/Users/cccc/Desktop/GJ/merge_table/plate_dates.csv'
-    result_df.to_csv(output_path, index=False, encoding='utf-8')
+    if pacsv is not None:
+        # 字符串字段统一加引号，pandas等读取结果与to_csv完全一致
+        pacsv.write_csv(pa.Table.from_pandas(result_df, preserve_index=False), output_path)
+    else:
+        result_df.to_csv(output_path, index=False, encoding='utf-8')
     print(f"文件已保存到：{output_path}")
     
     # 显示统计信息
@@ -4,12 +4,52 @@
 高性能处理大文件，支持进度显示和内存监控
 """
 
+import numpy as np
 import pandas as pd
 import time
 from pathlib import Path
 import psutil
 import sys
 
+from table_io import read_xlsx, write_xlsx
+
+try:
+    import ciso8601  # C实现的ISO8601解析，比pd.to_datetime快得多
+except ImportError:
+    ciso8601 = None
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """
+    把日期列解析为datetime：只解析去重后的值，再按编码展开回每一行
+    日期列重复值很多，去重后通常只剩几百到几千个不同的值
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = None
+    if ciso8601 is not None:
+        try:
+            parsed = pd.DatetimeIndex([ciso8601.parse_datetime(value) for value in uniques])
+        except (TypeError, ValueError):
+            # 不是ISO8601字符串（例如Excel中的日期单元格或其他写法），交给pd.to_datetime推断
+            parsed = None
+    if parsed is None:
+        parsed = pd.to_datetime(uniques)
+    # 编码-1对应空值，展开为NaT
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
+
+def is_sorted_without_parsing(values: pd.Series) -> bool:
+    """
+    不解析整列，判断日期列是否已经升序；返回False只表示无法直接确定，需要解析后再判断
+    datetime列直接比较；字符串列按字典序有序时，各日期按顺序成段出现，
+    只需解析去重后的值确认它们也是按日期升序的（例如2020-1-10排在2020-1-2前面就不是）
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.is_monotonic_increasing
+    if not values.is_monotonic_increasing:
+        return False
+    return parse_dates(pd.Series(pd.unique(values))).is_monotonic_increasing
+
 
 def fix_date_sorting(file_path: str, date_column: str = 'low_日期', backup: bool = True):
     """
@@ -46,7 +86,9 @@ def fix_date_sorting(file_path: str, date_column: str = 'low_日期', backup: bo
         
         # 2. 读取文件
         print(f"📖 读取文件...")
-        df = pd.read_excel(file_path, engine='openpyxl')
+        # read_xlsx优先用calamine，否则用openpyxl只读模式流式读取；
+        # 不用read_table：文件随后会被覆盖，没必要为它建Parquet缓存
+        df = read_xlsx(file_path)
         
         original_shape = df.shape
         print(f"✓ 读取完成，形状: {original_shape}")
@@ -66,31 +108,37 @@ def fix_date_sorting(file_path: str, date_column: str = 'low_日期', backup: bo
         original_dtype = df[date_column].dtype
         print(f"📋 原始日期格式: {original_dtype}")
         
-        # 5. 创建临时日期列用于排序（不修改原列）
-        print(f"🔄 创建排序用的临时日期列...")
-        df['_temp_date_for_sorting'] = pd.to_datetime(df[date_column])
+        # 5. 先直接检查原始列，已经有序时不必解析整列日期
+        if is_sorted_without_parsing(df[date_column]):
+            print(f"✅ 数据已经是升序排列，无需修复")
+            return True
         
-        # 6. 检查排序状态
-        is_sorted = df['_temp_date_for_sorting'].is_monotonic_increasing
+        # 6. 解析出排序用的临时日期（单独保存，不加入表中，也不修改原列），再检查排序状态
+        print(f"🔄 创建排序用的临时日期列...")
+        sort_dates = parse_dates(df[date_column])
+        is_sorted = sort_dates.is_monotonic_increasing
         if is_sorted:
             print(f"✅ 数据已经是升序排列，无需修复")
-            df.drop('_temp_date_for_sorting', axis=1, inplace=True)
             return True
         
-        # 7. 执行排序（使用临时列排序，但保持原始格式）
+        # 7. 执行排序（使用临时日期排序，但保持原始格式）
         print(f"📊 按 {date_column} 升序排序（保持原始格式）...")
-        df_sorted = df.sort_values(by='_temp_date_for_sorting', ascending=True)
-        
-        # 8. 删除临时列，保持原始日期格式
-        df_sorted.drop('_temp_date_for_sorting', axis=1, inplace=True)
+        # 直接对datetime64数组做稳定的argsort（NaT排在最后，与sort_values一致），
+        # 再按顺序一次性取出所有行；同一天的行保持原来的先后顺序
+        order = np.argsort(sort_dates.to_numpy(), kind='stable')
+        # 结果直接替换df：未排序的表随即释放，写出时内存中只有一份数据
+        # （sort_values(inplace=True)内部同样是取出副本再替换，省不掉这一份副本）
+        df = df.iloc[order]
         
-        # 验证排序结果（重新创建临时日期列验证）
-        temp_check = pd.to_datetime(df_sorted[date_column])
+        # 8. 验证排序结果直接用排好序的临时日期，不再重新解析一遍日期（整列日期只在第6步解析一次）
+        temp_check = sort_dates.iloc[order]
         assert temp_check.is_monotonic_increasing, "排序失败"
         
         # 9. 保存文件
         print(f"💾 保存排序后的文件...")
-        df_sorted.to_excel(file_path, index=False, engine='openpyxl')
+        # 流式写出（xlsxwriter的constant_memory模式，没有xlsxwriter时用openpyxl的write_only模式），
+        # 不在内存中构建整个工作簿
+        write_xlsx(df, file_path)
         
         # 10. 统计结果
         end_time = time.time()
@@ -1,70 +1,123 @@
 #!/usr/bin/env python3
+from collections import deque
+from itertools import islice
+
 import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
+
+from table_io import WRITE_CHUNK_ROWS, XlsxStreamWriter, iter_xlsx_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv  # 多线程解析CSV，比pandas的C解析器快数倍
+except ImportError:
+    pacsv = None
+
+def read_csv_chunks(csv_path):
+    """
+    逐块读取CSV，每块最多WRITE_CHUNK_ROWS行，读取结果与pd.read_csv一致
+    有pyarrow时整个文件由Arrow解析（列式存储，比DataFrame紧凑），再逐块转换为DataFrame
+    """
+    if pacsv is None:
+        yield from pd.read_csv(csv_path, chunksize=WRITE_CHUNK_ROWS)
+        return
+    
+    # 与read_csv一致：字符串列中的空值标记（空串、NA等）也读为空值
+    options = pacsv.ConvertOptions(strings_can_be_null=True)
+    table = pacsv.read_csv(csv_path, convert_options=options)
+    # Arrow会把形如2025-01-01的列推断为日期，read_csv则保留原文；这些列按字符串重新读取
+    temporal = {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+    if temporal:
+        options.column_types = temporal
+        table = pacsv.read_csv(csv_path, convert_options=options)
+    
+    batches = table.to_batches(max_chunksize=WRITE_CHUNK_ROWS)
+    if not batches:
+        # 只有表头时也返回一个空块，保留列名
+        yield table.to_pandas()
+    for batch in batches:
+        yield batch.to_pandas()
 
 def merge_csv_to_excel():
     """
     将plate_dates.csv的数据合并到表格5.xlsx下面，创建新的表格5.1.xlsx
+    两个文件都逐块读取并流式写出，不在内存中构建合并后的整张表
     """
     # 步骤1：读取表格5.xlsx
     print("步骤1：读取表格5.xlsx...")
     excel_path = '/Users/cccc/Desktop/GJ/merge_table/表格5.xlsx'
     try:
-        # 首先尝试读取Excel文件以查看其结构
-        excel_df = pd.read_excel(excel_path, engine='openpyxl')
-        print(f"表格5.xlsx的行数：{len(excel_df)}")
-        print(f"表格5.xlsx的列名：{list(excel_df.columns)}")
+        # 首先读取表头和前5行以查看其结构，其余行在写出时再逐行读取
+        excel_rows = iter_xlsx_rows(excel_path)
+        excel_columns = next(excel_rows, [])
+        excel_head = list(islice(excel_rows, 5))
+        print(f"表格5.xlsx的列名：{excel_columns}")
         print("\n表格5.xlsx的前5行预览：")
-        print(excel_df.head().to_string(index=False))
+        print(pd.DataFrame(excel_head, columns=excel_columns).to_string(index=False))
     except Exception as e:
         print(f"读取表格5.xlsx时出错：{e}")
-        # 如果文件不存在或为空，创建一个空的DataFrame
-        excel_df = pd.DataFrame()
+        # 如果文件不存在或为空，当作没有数据
+        excel_rows, excel_columns, excel_head = iter(()), [], []
     
-    # 步骤2：读取plate_dates.csv
+    # 步骤2：读取plate_dates.csv（按块读取）
     print("\n步骤2：读取plate_dates.csv...")
     csv_path = '/Users/cccc/Desktop/GJ/merge_table/plate_dates.csv'
-    csv_df = pd.read_csv(csv_path)
-    print(f"plate_dates.csv的行数：{len(csv_df)}")
-    print(f"plate_dates.csv的列名：{list(csv_df.columns)}")
+    csv_chunks = read_csv_chunks(csv_path)
+    first_chunk = next(csv_chunks)
+    csv_columns = list(first_chunk.columns)
+    print(f"plate_dates.csv的列名：{csv_columns}")
     
-    # 步骤3：合并数据
+    # 步骤3：确定合并后的列（与concat一致：按列名对齐，CSV中新出现的列追加在后面）
     print("\n步骤3：合并数据...")
-    if excel_df.empty:
+    if not excel_head:
         # 如果Excel文件为空，直接使用CSV数据
-        merged_df = csv_df
+        merged_columns = csv_columns
     else:
-        # 使用concat垂直合并两个DataFrame
-        merged_df = pd.concat([excel_df, csv_df], ignore_index=True)
+        merged_columns = excel_columns + [col for col in csv_columns if col not in excel_columns]
+    padding = (None,) * (len(merged_columns) - len(excel_columns))
     
-    print(f"合并后的总行数：{len(merged_df)}")
-    
-    # 步骤4：保存为新的Excel文件
+    # 步骤4：流式写出新的Excel文件
     print("\n步骤4：保存为表格5.1.xlsx...")
     output_path = '/Users/cccc/Desktop/GJ/merge_table/表格5.1.xlsx'
     
-    # 使用ExcelWriter保存
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        merged_df.to_excel(writer, index=False, sheet_name='Sheet1')
+    excel_count = 0
+    csv_count = 0
+    excel_tail = deque(maxlen=5)
+    
+    with XlsxStreamWriter(output_path, merged_columns) as writer:
+        if excel_head:
+            rows = excel_head
+            while rows:
+                # 列相同（最常见）时直接写出读到的行，不为每行再拼一个新元组
+                writer.append_rows([row + padding for row in rows] if padding else rows)
+                excel_count += len(rows)
+                excel_tail.extend(rows)
+                rows = list(islice(excel_rows, WRITE_CHUNK_ROWS))
+        
+        chunk = first_chunk
+        while chunk is not None:
+            writer.append(chunk.reindex(columns=merged_columns))
+            csv_count += len(chunk)
+            chunk = next(csv_chunks, None)
     
+    print(f"plate_dates.csv的行数：{csv_count}")
+    print(f"合并后的总行数：{excel_count + csv_count}")
     print(f"文件已保存到：{output_path}")
     
     # 显示统计信息
     print("\n=== 统计信息 ===")
-    print(f"原表格5.xlsx行数：{len(excel_df)}")
-    print(f"plate_dates.csv行数：{len(csv_df)}")
-    print(f"合并后总行数：{len(merged_df)}")
+    print(f"原表格5.xlsx行数：{excel_count}")
+    print(f"plate_dates.csv行数：{csv_count}")
+    print(f"合并后总行数：{excel_count + csv_count}")
     
     # 显示合并后数据的预览
-    if not excel_df.empty:
+    if excel_tail:
         # 显示原Excel数据的最后几行
         print("\n=== 原表格5.xlsx的最后5行 ===")
-        print(excel_df.tail().to_string(index=False))
+        print(pd.DataFrame(list(excel_tail), columns=excel_columns).to_string(index=False))
     
     # 显示CSV数据的前几行（这些会接在Excel数据后面）
     print("\n=== 新增的数据（前5行）===")
-    print(csv_df.head().to_string(index=False))
+    print(first_chunk.head().to_string(index=False))
 
 if __name__ == "__main__":
     merge_csv_to_excel()
\ No newline at end of file
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+表格文件读写：按后缀在Excel和Parquet之间分派
+02/03/04共用，中间结果可以保存为Parquet（列式存储，读写比Excel快一到两个数量级），
+只有最终需要交付的文件才写成Excel
+
+读取Excel时会在同目录的 .table_cache/ 下缓存一份Parquet，之后的步骤（或重复运行）
+直接读缓存，不再解析Excel；Excel文件的大小或修改时间与缓存记录的不一致时自动重建。设置环境变量 TABLE_CACHE=0 可关闭
+遵循Unix设计哲学：做好一件事
+"""
+
+import multiprocessing as mp
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+try:
+    import python_calamine  # noqa: F401  pandas的calamine引擎依赖（Rust实现）
+    # pandas 2.2起才有calamine引擎，更早的版本即使装了python-calamine也只能用openpyxl
+    HAS_CALAMINE = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+except ImportError:
+    HAS_CALAMINE = False
+
+try:
+    import xlsxwriter  # 直接流式写出XML，比openpyxl快数倍
+except ImportError:
+    xlsxwriter = None
+
+# 支持的输出格式 -> 文件后缀
+FORMATS = {'xlsx': '.xlsx', 'parquet': '.parquet'}
+TABLE_SUFFIXES = ('.xlsx', '.xls', '.parquet')
+
+# 流式写出时每次转换的行数
+WRITE_CHUNK_ROWS = 10000
+
+# Excel的Parquet缓存目录（位于Excel文件同目录下）
+CACHE_DIR = '.table_cache'
+CACHE_ENABLED = os.environ.get('TABLE_CACHE', '1') != '0'
+
+
+def is_parquet(path):
+    """按后缀判断是否为Parquet文件"""
+    return Path(path).suffix.lower() == '.parquet'
+
+
+def _header_names(header):
+    """
+    与read_excel一致：空表头命名为 Unnamed: i
+    openpyxl会把末尾只有格式、没有内容的单元格也读出来（值为None），read_excel不把它们算作列，这里同样去掉
+    """
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    return [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+
+
+def read_xlsx(path, columns=None):
+    """
+    读取第一个工作表：优先用calamine（Rust实现，比openpyxl快数倍），
+    否则用openpyxl只读模式逐行流式读取（不构建整个工作簿的DOM，内存占用基本恒定）
+    
+    Args:
+        path: 文件路径
+        columns: 只保留这些列（None表示全部列）
+    
+    Returns:
+        DataFrame
+    """
+    if HAS_CALAMINE:
+        # 引擎在导入时已确定。不绕过pd.read_excel直接调用calamine：省下的主要是pandas的单元格
+        # 转换（整数化、空值/"NA"识别、日期类型推断），自己重做一遍只快约20%，却容易和read_excel不一致
+        return pd.read_excel(path, engine='calamine', usecols=columns)
+    
+    rows = iter_xlsx_rows(path)
+    names = next(rows, None)
+    if names is None:
+        return pd.DataFrame(columns=columns)
+    if columns is None:
+        data = list(rows)
+    else:
+        missing = [col for col in columns if col not in names]
+        if missing:
+            rows.close()
+            raise ValueError(f"列不存在: {missing}")
+        keep = [names.index(col) for col in columns]
+        data = [tuple(row[i] for i in keep) for row in rows]
+        names = list(columns)
+        # 只保留部分列时，末尾可能多出在这些列上全空的行
+        while data and all(value is None for value in data[-1]):
+            data.pop()
+    
+    # 与read_excel一致：全空的列为float64的NaN
+    df = pd.DataFrame(data, columns=names)
+    for i in range(df.shape[1] if data else 0):
+        if df.dtypes.iloc[i] == object and df.iloc[:, i].isna().all():
+            df.isetitem(i, df.iloc[:, i].astype('float64'))
+    return df
+
+
+def iter_xlsx_rows(path):
+    """
+    用openpyxl只读模式逐行读取第一个工作表，内存占用与行数无关
+    
+    Yields:
+        第一项为表头列名列表，之后每项为与表头等宽的行元组；与read_excel一致，末尾的空行不输出
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # 有些工具写出的维度信息不准确，按实际内容读取
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = _header_names(header)
+        yield names
+        
+        width = len(names)
+        empty_row = (None,) * width
+        pending_empty = 0  # 连续空行先计数，后面还有数据时才补写出来
+        for row in rows:
+            row = row[:width] + (None,) * (width - len(row))
+            if row == empty_row:
+                pending_empty += 1
+                continue
+            for _ in range(pending_empty):
+                yield empty_row
+            pending_empty = 0
+            yield row
+    finally:
+        wb.close()
+
+
+def read_table(path, columns=None):
+    """
+    读取Excel或Parquet文件
+    
+    Args:
+        path: 文件路径
+        columns: 只读取这些列（None表示全部列）
+    
+    Returns:
+        DataFrame
+    """
+    if is_parquet(path):
+        return pd.read_parquet(path, columns=columns)
+    
+    cache = _valid_cache(path)
+    if cache is not None:
+        return pd.read_parquet(cache, columns=columns)
+    
+    # 读取前记下文件状态：读取期间文件被替换时，缓存对应的是旧状态，下次会判为失效
+    source_stat = os.stat(path)
+    if Path(path).suffix.lower() == '.xls':
+        # openpyxl不支持旧版xls
+        df = pd.read_excel(path, engine='calamine' if HAS_CALAMINE else None)
+    else:
+        df = read_xlsx(path)
+    _write_cache(df, path, source_stat)
+    return df if columns is None else df[list(columns)]
+
+
+def read_table_in_ranges(path, column, ranges):
+    """
+    只读取column落在任一闭区间内的行
+    Parquet文件（包括Excel的有效缓存）把条件下推给pyarrow，区间外的行不会被读入内存；
+    其余情况读取全部行，由调用方自行过滤
+    
+    Args:
+        path: 文件路径
+        column: 用于过滤的列名
+        ranges: [(min, max), ...] 闭区间列表
+    
+    Returns:
+        tuple: (DataFrame, 文件总行数)
+    """
+    source = path if is_parquet(path) else _valid_cache(path)
+    if source is None:
+        df = read_table(path)
+        return df, len(df)
+    
+    import pyarrow.parquet as pq
+    total_rows = pq.ParquetFile(source).metadata.num_rows
+    filters = [[(column, '>=', min_value), (column, '<=', max_value)] for min_value, max_value in ranges]
+    return pd.read_parquet(source, filters=filters), total_rows
+
+
+def native_io(paths, output_format):
+    """
+    读写是否全部由pyarrow完成：输入都是Parquet（或有有效缓存）且输出为Parquet
+    此时解析和编码都在C++中进行、不占用GIL，线程池就能并行；
+    只要涉及openpyxl/xlsxwriter（纯Python），就仍需多进程
+    """
+    if output_format != 'parquet':
+        return False
+    return all(is_parquet(path) or _valid_cache(path) is not None for path in paths)
+
+
+def cache_path(path):
+    """Excel文件对应的Parquet缓存路径"""
+    path = Path(path)
+    return path.parent / CACHE_DIR / f"{path.name}.parquet"
+
+
+def _source_key(st):
+    """缓存对应的Excel文件状态：大小和纳秒级修改时间"""
+    return {b'table_io.source_size': str(st.st_size).encode(),
+            b'table_io.source_mtime_ns': str(st.st_mtime_ns).encode()}
+
+
+def _valid_cache(path):
+    """
+    缓存存在且记录的Excel大小和修改时间与当前文件完全一致时返回缓存路径，否则返回None
+    只比较"缓存不比Excel旧"不够：cp -p、rsync -t、解压等会把文件换成修改时间更早的副本
+    """
+    if not CACHE_ENABLED:
+        return None
+    cache = cache_path(path)
+    try:
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(cache).metadata or {}
+        key = _source_key(os.stat(path))
+    except Exception:
+        return None  # 缓存不存在或已损坏
+    if all(metadata.get(name) == value for name, value in key.items()):
+        return cache
+    return None
+
+
+def _write_cache(df, path, source_stat):
+    """
+    写出Parquet缓存，并在元数据中记录读取时Excel文件的状态（source_stat）
+    目录不可写、列类型无法转换等情况直接跳过，不影响读取结果
+    """
+    if not CACHE_ENABLED:
+        return
+    cache = cache_path(path)
+    tmp_path = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        cache.parent.mkdir(exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_source_key(source_stat)})
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, cache)  # 多个进程同时缓存同一文件时也不会读到半个文件
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def read_columns(path):
+    """只读取表头，返回列名列表"""
+    if not is_parquet(path):
+        path = _valid_cache(path) or path
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    if Path(path).suffix.lower() == '.xls':
+        return list(pd.read_excel(path, nrows=0).columns)
+    
+    # 只取第一行，不读取其余数据（calamine会先解析整个工作表，取表头反而更慢）
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        header = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    return _header_names(header)
+
+
+def _iter_row_chunks(df):
+    """按块把DataFrame转成行列表，空值转为None（写成空单元格）"""
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        # copy=True：单个object/字符串列块可能返回只读视图，下面要原地替换空值
+        values = df.iloc[start:start + WRITE_CHUNK_ROWS].to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        yield values.tolist()
+
+
+class XlsxStreamWriter:
+    """
+    流式写出单个工作表：可以多次append，内存占用与总行数无关
+    优先用xlsxwriter的constant_memory模式，否则用openpyxl的write_only模式
+    """
+    
+    def __init__(self, path, columns):
+        self.path = path
+        self.rows_written = 0
+        if xlsxwriter is not None:
+            # strings_to_urls关闭：网址按普通文本写出（与openpyxl一致），也省去逐个字符串的URL匹配
+            self._wb = xlsxwriter.Workbook(str(path), {'constant_memory': True,
+                                                       'strings_to_urls': False,
+                                                       'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+            self._ws = self._wb.add_worksheet()
+            # 与to_excel的表头样式一致
+            header_format = self._wb.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+            self._ws.write_row(0, 0, list(columns), header_format)
+        else:
+            self._wb = Workbook(write_only=True)
+            self._ws = self._wb.create_sheet()
+            self._ws.append(list(columns))
+    
+    def append(self, df):
+        """追加DataFrame的所有行（列顺序需与表头一致）"""
+        for rows in _iter_row_chunks(df):
+            self.append_rows(rows)
+    
+    def append_rows(self, rows):
+        """追加若干行，每行是与表头顺序一致的值序列，空值用None表示"""
+        # 数据行以原始值列表写出、不带任何格式，只有表头在构造时设置一次样式
+        if xlsxwriter is not None:
+            for r, row in enumerate(rows, start=self.rows_written + 1):
+                self._ws.write_row(r, 0, row)
+        else:
+            for row in rows:
+                self._ws.append(row)
+        self.rows_written += len(rows)
+    
+    def close(self):
+        """完成写出"""
+        if self._wb is None:
+            return
+        if xlsxwriter is not None:
+            self._wb.close()
+        else:
+            self._wb.save(self.path)
+        self._wb = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_xlsx(df, path):
+    """流式写出单个工作表，内存占用与行数无关"""
+    with XlsxStreamWriter(path, df.columns) as writer:
+        writer.append(df)
+
+
+class ParquetStreamWriter:
+    """
+    流式写出Parquet：每次append写成一个row group，内存中只有当前这一块
+    表结构以第一次append的数据为准，之后的数据转换为同一结构
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self._writer = None
+    
+    def append(self, df):
+        """追加DataFrame的所有行"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(str(self.path), table.schema, compression='zstd')
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+        self.rows_written += len(df)
+    
+    def close(self):
+        """完成写出"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def estimate_rows(path):
+    """
+    只读元数据估算数据行数（不含表头），不解析单元格
+    Parquet（包括有效缓存）取元数据中的行数；xlsx取工作表记录的维度，无法得知时返回0
+    """
+    source = path if is_parquet(path) else _valid_cache(path)
+    if source is not None:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(source).metadata.num_rows
+    if Path(path).suffix.lower() == '.xls':
+        return 0
+    
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        max_row = wb.worksheets[0].max_row
+    finally:
+        wb.close()
+    return max((max_row or 0) - 1, 0)
+
+
+def write_polars(df, path):
+    """
+    按后缀写出Polars DataFrame，不经过to_pandas中转
+    Parquet直接由Polars写出；xlsx按块取出行元组流式写入工作表
+    """
+    if is_parquet(path):
+        import polars as pl  # 只有传入Polars DataFrame时才用到，02/03/04无需安装polars
+        
+        # 内存中的Categorical编码只是表示方式，写出时还原为字符串列，文件结构与pandas路径一致
+        df = df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+        df.write_parquet(path, compression='zstd', row_group_size=200_000)
+        return
+    
+    with XlsxStreamWriter(path, df.columns) as writer:
+        for chunk in df.iter_slices(WRITE_CHUNK_ROWS):
+            # NaN写成空单元格，与pandas路径一致；逐块替换，避免复制整张表
+            writer.append_rows(chunk.fill_nan(None).rows())
+
+
+def write_table(df, path):
+    """按后缀写出Excel或Parquet文件"""
+    if is_parquet(path):
+        df.to_parquet(path, index=False, compression='zstd')
+    else:
+        write_xlsx(df, path)
+
+
+def find_tables(directory, recursive=False):
+    """
+    查找目录中的表格文件（.xlsx/.xls/.parquet）
+    同一目录下同名的Excel和Parquet文件只返回Parquet，避免同一份数据被处理两次
+    
+    Args:
+        directory: 目录路径
+        recursive: 是否递归查找子目录
+    
+    Returns:
+        list: 文件路径列表
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    
+    pattern = "**/*" if recursive else "*"
+    tables = {}
+    for path in directory.glob(pattern):
+        if path.suffix.lower() not in TABLE_SUFFIXES or path.name.startswith('~$'):
+            continue
+        if any(part.startswith('.') for part in path.relative_to(directory).parts[:-1]):
+            continue  # 跳过隐藏目录（包括 .table_cache 缓存）
+        key = path.with_suffix('')
+        if key not in tables or is_parquet(path):
+            tables[key] = path
+    
+    return sorted(tables.values())
+
+
+def pool_context():
+    """
+    工作进程池的启动方式：Linux上用fork，worker直接继承已导入的pandas等模块，无需重新导入
+    macOS上fork后系统框架可能崩溃或死锁（Python 3.8起默认spawn），Windows只支持spawn
+    """
+    return mp.get_context('fork' if sys.platform.startswith('linux') else 'spawn')
\ No newline at end of file
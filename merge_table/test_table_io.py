@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+table_io 回归测试：读出的表头和行需与 pd.read_excel 一致
+运行：python -m unittest test_table_io
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+import table_io
+
+
+class StyledTrailingHeaderTest(unittest.TestCase):
+    """表头末尾有只设置了格式的空单元格（如加粗的空E1）"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.plain = os.path.join(self.tmpdir, '1.xlsx')
+        self.styled = os.path.join(self.tmpdir, '2.xlsx')
+        for path, styled in ((self.plain, False), (self.styled, True)):
+            wb = Workbook()
+            ws = wb.active
+            ws.append(['车牌号', '日期', '里程'])
+            ws.append(['京A12345', '2025/1/3', 12.5])
+            if styled:
+                ws['D1'].font = Font(bold=True)
+            wb.save(path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_read_columns(self):
+        expected = list(pd.read_excel(self.styled).columns)
+        self.assertEqual(table_io.read_columns(self.styled), expected)
+        self.assertEqual(table_io.read_columns(self.styled), table_io.read_columns(self.plain))
+    
+    def test_iter_xlsx_rows(self):
+        rows = list(table_io.iter_xlsx_rows(self.styled))
+        self.assertEqual(rows, [['车牌号', '日期', '里程'], ('京A12345', '2025/1/3', 12.5)])
+    
+    def test_read_xlsx_openpyxl(self):
+        has_calamine = table_io.HAS_CALAMINE
+        table_io.HAS_CALAMINE = False
+        try:
+            df = table_io.read_xlsx(self.styled)
+        finally:
+            table_io.HAS_CALAMINE = has_calamine
+        pd.testing.assert_frame_equal(df, pd.read_excel(self.styled))
+
+
+
+class CacheTest(unittest.TestCase):
+    """Parquet缓存只在Excel文件的大小和修改时间都与记录一致时使用"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'data.xlsx')
+        pd.DataFrame({'里程': [1, 2]}).to_excel(self.path, index=False)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_older_copy_invalidates_cache(self):
+        if not table_io.CACHE_ENABLED:
+            self.skipTest('TABLE_CACHE=0')
+        table_io.read_table(self.path)
+        self.assertIsNotNone(table_io._valid_cache(self.path))
+        
+        # 换成一份修改时间更早的副本，如 cp -p / rsync -t
+        old_mtime = os.stat(self.path).st_mtime - 3600
+        pd.DataFrame({'里程': [3, 4, 5]}).to_excel(self.path, index=False)
+        os.utime(self.path, (old_mtime, old_mtime))
+        self.assertIsNone(table_io._valid_cache(self.path))
+        self.assertEqual(table_io.read_table(self.path)['里程'].tolist(), [3, 4, 5])
+        self.assertIsNotNone(table_io._valid_cache(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+将Excel文件一次性转换为Parquet，供02/03/04作为中间格式反复读取
+Excel只解析一次，之后各步骤直接读Parquet
+遵循Unix设计哲学：做好一件事
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from table_io import read_table, write_table
+
+
+def convert_file(input_file, output_dir=None):
+    """
+    转换单个Excel文件
+    
+    Args:
+        input_file: 输入Excel文件路径
+        output_dir: 输出目录（默认与输入文件同目录）
+    
+    Returns:
+        Path: 输出的Parquet文件路径
+    """
+    input_path = Path(input_file)
+    target_dir = Path(output_dir) if output_dir else input_path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    output_path = target_dir / f"{input_path.stem}.parquet"
+    
+    df = read_table(input_path)
+    # 混合类型的object列无法按单一类型写入Parquet，统一转为字符串
+    for col in df.columns:
+        if df[col].dtype == object and df[col].map(type).nunique() > 1:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    
+    write_table(df, output_path)
+    return output_path
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='将Excel文件转换为Parquet格式',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  python %(prog)s data.xlsx                 # 在同目录生成data.parquet
+  python %(prog)s data/ -o parquet/         # 转换目录下所有xlsx文件
+        """
+    )
+    
+    parser.add_argument('input', help='输入Excel文件或目录')
+    parser.add_argument('-o', '--output-dir', help='输出目录（默认与输入文件同目录）')
+    
+    args = parser.parse_args()
+    
+    input_path = Path(args.input)
+    if input_path.is_dir():
+        files = sorted(f for f in input_path.glob("*.xlsx") if not f.name.startswith('~$'))
+    elif input_path.exists():
+        files = [input_path]
+    else:
+        print(f"❌ 路径不存在: {input_path}")
+        sys.exit(1)
+    
+    if not files:
+        print(f"❌ 在 {input_path} 中未找到xlsx文件")
+        sys.exit(1)
+    
+    start_time = time.time()
+    failed = 0
+    for file_path in files:
+        try:
+            output_path = convert_file(file_path, args.output_dir)
+            print(f"✅ {file_path.name} -> {output_path.name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {file_path.name}: {e}")
+    
+    print(f"\n转换完成: {len(files) - failed}/{len(files)} 个文件，耗时 {time.time() - start_time:.2f}秒")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file